@@ -0,0 +1,473 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import compiler
+
+# ==========================================
+#        SYNTHETIC PROGRAM GENERATOR
+# ==========================================
+
+# Shapes of generated programs. weights scale the chance of picking
+# production idx of a nonterminal (default 1); the rates are per token.
+SHAPES = {
+    'functions': {
+        'max_depth': 30,
+        'weights': {('Declaration-prime', 0): 4, ('Statement-list', 0): 2},
+    },
+    'nesting': {
+        'max_depth': 400,
+        'weights': {('Statement', 1): 4, ('Statement', 2): 4, ('Statement', 3): 3,
+                    ('Statement-list', 0): 1, ('Declaration-prime', 0): 8},
+    },
+    'expressions': {
+        'max_depth': 60,
+        'weights': {('D', 0): 8, ('G', 0): 4, ('G', 1): 4, ('Arg-list-prime', 0): 3,
+                    ('Declaration-prime', 0): 8},
+    },
+    'comments': {
+        'max_depth': 30,
+        'weights': {('Declaration-prime', 0): 4},
+        'comment_rate': 0.3,
+    },
+    'illegal': {
+        'max_depth': 30,
+        'weights': {('Declaration-prime', 0): 4},
+        'illegal_rate': 0.2,
+    },
+    'broken': {
+        'max_depth': 30,
+        'weights': {('Declaration-prime', 0): 4},
+        'mutation_rate': 0.02,
+    },
+}
+
+NAMES = ['i', 'j', 'k', 'n', 'x', 'y', 'sum', 'count', 'arr', 'value', 'result', 'tmp']
+ILLEGAL = ['@', '#', '$', '!', '&', '|', '?', '%', '^', '~']
+COMMENTS = ['/* generated comment */', '// line comment\n', '/* multi\n   line\n   comment */']
+
+class ProgramGenerator:
+    """
+    Derive random C-minus programs from TableDrivenParser.GRAMMAR. The
+    top-level Declaration-list keeps growing until `size` tokens have
+    been produced; beyond max_depth every nonterminal takes its shortest
+    production (as does everything once twice `size` tokens have been
+    produced) so derivations always terminate. Right-recursive list
+    tails do not count towards depth.
+    """
+    def __init__(self, shape='functions', size=10000, seed=0):
+        self.grammar = compiler.TableDrivenParser.GRAMMAR
+        self.shape = SHAPES[shape]
+        self.size = size
+        self.random = random.Random(seed)
+        self.min_length = self.compute_min_lengths()
+
+    def compute_min_lengths(self):
+        """
+        Fixpoint over the grammar: shortest terminal yield per nonterminal.
+        """
+        inf = float('inf')
+        lengths = {nt: inf for nt in self.grammar}
+        changed = True
+        while changed:
+            changed = False
+            for nt, productions in self.grammar.items():
+                for rhs in productions:
+                    n = sum(lengths.get(sym, 1) for sym in rhs)
+                    if n < lengths[nt]:
+                        lengths[nt] = n
+                        changed = True
+        return lengths
+
+    def production_length(self, rhs):
+        return sum(self.min_length.get(sym, 1) for sym in rhs)
+
+    def choose(self, nt, depth, emitted):
+        productions = self.grammar[nt]
+        if nt == 'Declaration-list' and depth == 0:
+            # Top level: keep adding declarations until the size is reached
+            return 0 if emitted < self.size else 1
+        if depth > self.shape['max_depth'] or emitted > 2 * self.size:
+            return min(range(len(productions)), key=lambda i: self.production_length(productions[i]))
+        weights = [self.shape['weights'].get((nt, i), 1) for i in range(len(productions))]
+        return self.random.choices(range(len(productions)), weights)[0]
+
+    def lexeme(self, terminal):
+        if terminal == 'ID':
+            return self.random.choice(NAMES)
+        if terminal == 'NUM':
+            return str(self.random.randint(0, 1000))
+        return terminal
+
+    def tokens(self):
+        tokens = []
+        # Program -> Declaration-list $; start below it so depth 0 is the top level
+        stack = [('Declaration-list', 0)]
+        while stack:
+            symbol, depth = stack.pop()
+            if symbol not in self.grammar:
+                tokens.append(self.lexeme(symbol))
+                continue
+            rhs = self.grammar[symbol][self.choose(symbol, depth, len(tokens))]
+            for child in reversed(rhs):
+                stack.append((child, depth if child == symbol else depth + 1))
+        return tokens
+
+    def mutate(self, tokens):
+        rate = self.shape.get('mutation_rate', 0)
+        if not rate:
+            return tokens
+        pool = ['int', 'void', 'if', 'else', ';', '{', '}', '(', ')', '[', ']', '=', '+', 'x', '1']
+        out = []
+        for token in tokens:
+            r = self.random.random()
+            if r < rate / 2:
+                continue
+            out.append(token)
+            if r > 1 - rate / 2:
+                out.append(self.random.choice(pool))
+        return out
+
+    def source(self):
+        tokens = self.mutate(self.tokens())
+        comment_rate = self.shape.get('comment_rate', 0)
+        illegal_rate = self.shape.get('illegal_rate', 0)
+        parts = []
+        for token in tokens:
+            if comment_rate and self.random.random() < comment_rate:
+                parts.append(self.random.choice(COMMENTS))
+            if illegal_rate and self.random.random() < illegal_rate:
+                parts.append(self.random.choice(ILLEGAL))
+            parts.append(token)
+            parts.append('\n' if token in (';', '{', '}') else ' ')
+        return ''.join(parts)
+
+# ==========================================
+#              MEASUREMENT
+# ==========================================
+
+# An EventParser engine writes its tree through write_event_tree, as
+# --stream-tree does (see tree_output).
+ENGINES = {'recursive': compiler.Parser, 'table': compiler.TableDrivenParser,
+           'check': compiler.Recognizer, 'event': compiler.EventParser}
+SCANNERS = {'default': compiler.Scanner, 'regex': compiler.RegexScanner,
+            'mmap': compiler.MmapScanner, 'stream': compiler.StreamScanner}
+
+def count_nodes(root):
+    count = 0
+    stack = [root] if root is not None else []
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+def tree_output(engine_class):
+    """
+    A temporary binary file for an EventParser engine to write
+    parse_tree.txt to; a null context (None) for other engines.
+    """
+    if issubclass(engine_class, compiler.EventParser):
+        return tempfile.TemporaryFile()
+    return contextlib.nullcontext()
+
+def scanner_input(scanner, source):
+    """
+    The source in the form the named scanner reads.
+    """
+    if scanner == 'mmap':
+        return source.encode('utf-8')
+    if scanner == 'stream':
+        return io.StringIO(source)
+    return source
+
+def compile_input(code, engine, scanner, tree_file=None):
+    """
+    Compile code, as given by scanner_input, with the named engine and
+    scanner. A stream goes through compile_stream, as '-' does on the
+    command line.
+    """
+    if scanner == 'stream':
+        return compiler.compile_stream(code, ENGINES[engine], tree_file=tree_file)
+    return compiler.compile_source(code, ENGINES[engine], SCANNERS[scanner], tree_file=tree_file)
+
+def run_case(shape, size, seed, engine, scanner):
+    """
+    Generate one program and time scanning, parsing (from pre-scanned
+    tokens) and rendering separately. Meant to run in a fresh process so
+    ru_maxrss reflects this case alone.
+    """
+    source = ProgramGenerator(shape, size, seed).source()
+    scanner_class, engine_class = SCANNERS[scanner], ENGINES[engine]
+    code = scanner_input(scanner, source)
+
+    start = time.perf_counter()
+    tokens = list(scanner_class(code).tokens())
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser = engine_class(tokens)
+    with tree_output(engine_class) as tree_file:
+        if tree_file is not None:
+            # Parsing and rendering are one pass, counted as parsing
+            compiler.write_event_tree(parser.events(), tree_file)
+            root = None
+        else:
+            root = parser.build_program()
+    parse_time = time.perf_counter() - start
+
+    render_time = 0.0
+    if root is not None:
+        with open(os.devnull, 'w', encoding='utf-8') as sink:
+            start = time.perf_counter()
+            compiler.write_tree(root, sink)
+            render_time = time.perf_counter() - start
+
+    nodes = count_nodes(root)
+    total = scan_time + parse_time + render_time
+    return {
+        'shape': shape, 'size': size, 'seed': seed, 'engine': engine, 'scanner': scanner,
+        'bytes': len(source), 'tokens': len(tokens), 'nodes': nodes,
+        'syntax_errors': len(parser.syntax_errors),
+        'scan_s': scan_time, 'parse_s': parse_time, 'render_s': render_time, 'total_s': total,
+        'tokens_per_s': len(tokens) / total, 'nodes_per_s': nodes / total,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def lookahead_kinds(scanner_class, code):
+    """The lookahead symbols the parser sees, as set by Parser.advance."""
+    kinds = []
+    for token in scanner_class(code).tokens():
+        if token.type in ('KEYWORD', 'SYMBOL'):
+            kinds.append(token.value)
+        elif token.type in ('ID', 'NUM'):
+            kinds.append(token.type)
+        elif token.value == '$':
+            kinds.append('$')
+    return kinds
+
+def bench_decisions(size, seed, repeat=5):
+    """
+    Per-token cost of one FIRST/FOLLOW membership test, the parser's
+    core decision, for list scans, frozensets and integer bitmasks over
+    interned token IDs.
+    """
+    kinds = lookahead_kinds(compiler.Scanner, ProgramGenerator('functions', size, seed).source())
+    sets = list(compiler.Parser.FIRST.values()) + list(compiler.Parser.FOLLOW.values())
+    token_ids = {t: i for i, t in enumerate(sorted(set().union(*sets, kinds)))}
+    lists = [sorted(s) for s in sets]
+    masks = [sum(1 << token_ids[t] for t in s) for s in sets]
+    bits = [1 << token_ids[k] for k in kinds]
+
+    def time_list():
+        for k in kinds:
+            for s in lists:
+                k in s
+
+    def time_frozenset():
+        for k in kinds:
+            for s in sets:
+                k in s
+
+    def time_bitmask():
+        for b in bits:
+            for m in masks:
+                b & m
+
+    decisions = len(kinds) * len(sets)
+    results = {}
+    for name, fn in [('list', time_list), ('frozenset', time_frozenset), ('bitmask', time_bitmask)]:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        results[name] = best / decisions * 1e9
+    return results
+
+def memory_case(shape, size, seed):
+    """
+    Memory retained by the tree and scanner results of one compile, and
+    how many distinct string objects label its terminal nodes.
+    """
+    code = ProgramGenerator(shape, size, seed).source()
+    tracemalloc.start()
+    result = compiler.compile_source(code)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    terminals, labels = 0, set()
+    stack = [result.tree]
+    while stack:
+        node = stack.pop()
+        if node.children:
+            stack.extend(node.children)
+        elif node.name.startswith('('):
+            terminals += 1
+            labels.add(id(node.name))
+    return {'shape': shape, 'tokens': size, 'nodes': count_nodes(result.tree),
+            'terminals': terminals, 'label_objects': len(labels), 'retained_mb': retained / 1e6}
+
+def scan_file_case(path, scanner):
+    """
+    Tokenize the file at path without keeping the tokens, so ru_maxrss
+    shows what holding the input costs each scanner.
+    """
+    scanner_class = SCANNERS[scanner]
+    start = time.perf_counter()
+    if scanner == 'stream':
+        with open(path, 'rb') as f:
+            tokens = sum(1 for _ in scanner_class(f).tokens())
+    else:
+        with compiler.open_source(path, scanner_class) as code:
+            tokens = sum(1 for _ in scanner_class(code).tokens())
+    return {'scanner': scanner, 'bytes': os.path.getsize(path), 'tokens': tokens,
+            'scan_s': time.perf_counter() - start,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+# Inputs that are not programs at all, to stress error recovery. Each
+# takes a random.Random and a size in characters.
+GARBAGE = {
+    'bytes': lambda rng, n: rng.randbytes(n).decode('latin-1'),
+    'braces': lambda rng, n: '}\n' * (n // 2),
+    'tokens': lambda rng, n: ' '.join(rng.choice(['}', ')', ']', ',', 'else', '==', '=', '1', 'x', ';'])
+                                      for _ in range(n // 3)),
+    'nesting': lambda rng, n: 'void f(void) {' + '{ x = (' * (n // 7),
+    'illegal': lambda rng, n: ''.join(rng.choice(ILLEGAL) for _ in range(n)),
+}
+
+# Garbage nested about as deep as it is long. Its tree text grows with
+# the square of the depth, terabytes at a megabyte of input,
+# so engines that write that text (see tree_output) skip it.
+DEEP_GARBAGE = {'nesting'}
+
+def garbage_case(kind, megabytes, seed, engine, scanner):
+    """
+    Compile megabytes of one kind of garbage; meant to run in a fresh
+    process like run_case.
+    """
+    source = GARBAGE[kind](random.Random(seed), int(megabytes * 1e6))
+    code = scanner_input(scanner, source)
+    start = time.perf_counter()
+    with tree_output(ENGINES[engine]) as tree_file:
+        result = compile_input(code, engine, scanner, tree_file)
+    return {'kind': kind, 'engine': engine, 'scanner': scanner, 'bytes': len(source),
+            'seconds': time.perf_counter() - start, 'syntax_errors': len(result.syntax_errors),
+            'lexical_errors': len(result.lexical_errors),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def run_isolated(fn, *args):
+    with ProcessPoolExecutor(1, max_tasks_per_child=1) as pool:
+        return pool.submit(fn, *args).result()
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+def print_results(results, baseline=None):
+    old = {}
+    if baseline:
+        old = {(r['shape'], r['engine'], r['scanner']): r for r in baseline['results']}
+    print(f"{'case':<28}{'tokens':>9}{'nodes':>10}{'scan s':>9}{'parse s':>9}"
+          f"{'render s':>10}{'tok/s':>10}{'RSS MB':>8}")
+    for r in results:
+        name = f"{r['shape']}/{r['engine']}/{r['scanner']}"
+        line = (f"{name:<28}{r['tokens']:>9}{r['nodes']:>10}{r['scan_s']:>9.3f}{r['parse_s']:>9.3f}"
+                f"{r['render_s']:>10.3f}{r['tokens_per_s']:>10.0f}{r['peak_rss_kb'] / 1024:>8.1f}")
+        prev = old.get((r['shape'], r['engine'], r['scanner']))
+        if prev:
+            line += f"  x{prev['total_s'] / r['total_s']:.2f} vs {baseline.get('revision')}"
+        print(line)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the scanner and parser on generated programs.")
+    arg_parser.add_argument('--shapes', nargs='+', default=sorted(SHAPES), choices=sorted(SHAPES))
+    arg_parser.add_argument('--size', type=int, default=20000, help="approximate tokens per program")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--engine', nargs='+', default=['recursive'], choices=sorted(ENGINES))
+    arg_parser.add_argument('--scanner', nargs='+', default=['default'], choices=sorted(SCANNERS))
+    arg_parser.add_argument('--save', help="write results to this JSON file")
+    arg_parser.add_argument('--compare', help="JSON file from an earlier --save to compare against")
+    arg_parser.add_argument('--decisions', action='store_true',
+                            help="micro-benchmark FIRST/FOLLOW membership tests and exit")
+    arg_parser.add_argument('--memory', action='store_true',
+                            help="report memory retained by the compiled tree and exit")
+    arg_parser.add_argument('--emit', help="write the program for the first shape here and exit")
+    arg_parser.add_argument('--garbage', type=float, metavar='MB',
+                            help="compile this many megabytes of each kind of garbage and exit")
+    arg_parser.add_argument('--scan-file', metavar='PATH',
+                            help="report time and peak RSS of tokenizing this file with each "
+                                 "--scanner and exit")
+    args = arg_parser.parse_args(argv)
+
+    if args.emit:
+        with open(args.emit, 'w', encoding='utf-8') as f:
+            f.write(ProgramGenerator(args.shapes[0], args.size, args.seed).source())
+        return 0
+
+    if args.garbage:
+        for kind in GARBAGE:
+            for engine in args.engine:
+                for scanner in args.scanner:
+                    if kind in DEEP_GARBAGE and issubclass(ENGINES[engine], compiler.EventParser):
+                        print(f"{kind + '/' + engine + '/' + scanner:<28} skipped: its tree text "
+                              f"grows with the square of its depth")
+                        continue
+                    r = run_isolated(garbage_case, kind, args.garbage, args.seed, engine, scanner)
+                    print(f"{kind + '/' + engine + '/' + scanner:<28} {r['bytes'] / 1e6:.1f} MB in "
+                          f"{r['seconds']:.2f}s, {r['syntax_errors']} syntax and "
+                          f"{r['lexical_errors']} lexical errors, peak RSS "
+                          f"{r['peak_rss_kb'] / 1024:.1f} MB")
+        return 0
+
+    if args.scan_file:
+        for scanner in args.scanner:
+            r = run_isolated(scan_file_case, args.scan_file, scanner)
+            print(f"{scanner:<8} {r['bytes'] / 1e6:.1f} MB, {r['tokens']} tokens in "
+                  f"{r['scan_s']:.2f}s, peak RSS {r['peak_rss_kb'] / 1024:.1f} MB")
+        return 0
+
+    if args.memory:
+        for shape in args.shapes:
+            r = run_isolated(memory_case, shape, args.size, args.seed)
+            print(f"{shape:<12} {r['nodes']} nodes, {r['terminals']} terminals with "
+                  f"{r['label_objects']} distinct label objects, {r['retained_mb']:.1f} MB retained")
+        return 0
+
+    if args.decisions:
+        for name, ns in bench_decisions(args.size, args.seed).items():
+            print(f"{name:<10}{ns:>8.1f} ns/decision")
+        return 0
+
+    results = []
+    for shape in args.shapes:
+        for engine in args.engine:
+            for scanner in args.scanner:
+                results.append(run_isolated(run_case, shape, args.size, args.seed, engine, scanner))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'revision': git_revision(), 'python': sys.version.split()[0],
+                       'results': results}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
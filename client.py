@@ -0,0 +1,143 @@
+import argparse
+import errno
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+
+# Only the standard library is imported here: the point of the client is
+# to skip loading compiler.py (and anytree) on every compile.
+
+# The socket lives in a directory only its user can enter, so no one
+# else can bind its name first or swap it: $XDG_RUNTIME_DIR, or else one
+# the server makes in the temp dir.
+SOCKET_DIR = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(
+    tempfile.gettempdir(), f"cminus-compiler-{os.getuid()}")
+DEFAULT_SOCKET = os.environ.get('CMINUS_SOCKET') or os.path.join(SOCKET_DIR, 'cminus-compiler.sock')
+
+def private_dir(path, create=False):
+    """
+    Check that path is a directory of this user's that no one else can
+    write to, first making it with mode 0700 if create is set. Raises
+    PermissionError otherwise.
+    """
+    if create:
+        try:
+            os.mkdir(path, 0o700)
+        except FileExistsError:
+            pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise PermissionError(errno.EACCES, "not a directory private to this user", path)
+
+def check_owner(path):
+    """
+    Raise PermissionError unless path is a socket of this user's.
+    """
+    st = os.lstat(path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(errno.EACCES, "socket is not owned by this user", path)
+
+class Connection:
+    """
+    A connection to a compile server (compiler.py --serve). Requests and
+    responses are JSON objects, one per line.
+    """
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        check_owner(socket_path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(socket_path)
+            self.check_peer(socket_path)
+        except OSError:
+            self.socket.close()
+            raise
+        self.file = self.socket.makefile('rwb')
+
+    def check_peer(self, socket_path):
+        # The socket file may have changed hands since check_owner; the
+        # peer's credentials say who is actually listening.
+        if hasattr(socket, 'SO_PEERCRED'):
+            size = struct.calcsize('3i')
+            pid, uid, gid = struct.unpack('3i', self.socket.getsockopt(
+                socket.SOL_SOCKET, socket.SO_PEERCRED, size))
+            if uid != os.getuid():
+                raise PermissionError(errno.EACCES, "compile server runs as another user",
+                                      socket_path)
+
+    def request(self, **message):
+        self.file.write(json.dumps(message).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("compile server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(
+        description="Compile C-minus sources on a running compile server. With no "
+                    "inputs, compiles input.txt next to this script into the current "
+                    "directory. Without a server, compiles in this process instead.")
+    arg_parser.add_argument('inputs', nargs='*', help="C-minus source files; - reads standard input")
+    arg_parser.add_argument('-o', '--out-dir', action='append', default=[],
+                            help="output directory; give once, or once per input")
+    arg_parser.add_argument('--socket', default=DEFAULT_SOCKET, help="server socket path")
+    arg_parser.add_argument('--stop', action='store_true', help="shut the server down")
+    return arg_parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    inputs = args.inputs
+    if not inputs and not args.stop:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        inputs = [os.path.join(script_dir, 'input.txt')]
+        if not os.path.exists(inputs[0]):
+            print(f"Error: input.txt not found in {script_dir}")
+            return
+    # The server resolves '.' against its own directory, so send ours.
+    out_dirs = [os.path.abspath(d) for d in args.out_dir or ['.']]
+    try:
+        connection = Connection(args.socket)
+    except OSError as e:
+        if isinstance(e, PermissionError):
+            print(f"Not using compile server at {args.socket}: {e.strerror}", file=sys.stderr)
+        if args.stop:
+            print(f"No compile server at {args.socket}", file=sys.stderr)
+            return 1
+        import compiler
+        return compiler.main(args.inputs + [f"--out-dir={d}" for d in args.out_dir])
+
+    with connection:
+        if args.stop:
+            connection.request(command='shutdown')
+            return 0
+        message = {'inputs': [path if path == '-' else os.path.abspath(path) for path in inputs],
+                   'out_dirs': out_dirs}
+        if '-' in inputs:
+            message['stdin'] = sys.stdin.buffer.read().decode('utf-8')
+        response = connection.request(**message)
+    if 'error' in response:
+        print(f"Error: {response['error']}", file=sys.stderr)
+        return 2
+    failed = 0
+    for result in response['results']:
+        if result['error']:
+            print(f"Error compiling {result['path']}: {result['error']}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,34 @@
 # Donya Jafari 401101524 - Nika Ghaderi 401106328
+import argparse
+import bisect
+import codecs
+import contextlib
+import cProfile
+import errno
+import functools
+import gc
+import hashlib
+import io
+import json
+import mmap
 import os
+import re
+import shutil
+import signal
+import socket
+import socketserver
+import stat
+import struct
 import sys
-from anytree import Node as AnyNode, RenderTree
+import tempfile
+import threading
+import time
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from anytree import Node as AnyNode
+
+import grammar
 
 # Increase recursion depth just in case
 sys.setrecursionlimit(3000)
@@ -9,25 +36,264 @@ sys.setrecursionlimit(3000)
 # ==========================================
 #        CUSTOM NODE CLASS
 # ==========================================
-class Node(AnyNode):
+class Node:
     """
-    Wrapper around anytree.Node to support .add_child() 
-    and maintain compatibility with the parser code.
+    Lightweight parse-tree node without anytree's per-attach bookkeeping.
+    Leaves share an empty tuple for .children.
     """
+    __slots__ = ('name', 'parent', 'children')
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = None
+        self.children = ()
+        if parent is not None:
+            parent.add_child(self)
+
     def add_child(self, child):
         if child:
             child.parent = self
+            if self.children:
+                self.children.append(child)
+            else:
+                self.children = [child]
+
+    def to_anytree(self):
+        """
+        Copy this subtree into anytree nodes for code that needs anytree.
+        """
+        # Post-order, so each copy is attached before its parent is.
+        copies = {}
+        stack = [(self, False)]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                children = [copies.pop(child) for child in node.children]
+                copies[node] = AnyNode(node.name, children=children)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children)
+        return copies[self]
+
+# ==========================================
+#           PARSE TREE RENDERING
+# ==========================================
+# Same box-drawing layout as anytree's RenderTree with ContStyle.
+BRANCH, LAST_BRANCH = '├── ', '└── '
+VERTICAL, SPACE = '│   ', '    '
+
+def iter_tree_lines(root):
+    """
+    Yield the rendered lines of the tree in preorder, without recursion.
+    One indent string follows the walk, growing by a segment on the way
+    down and shrinking on the way up, so memory stays linear in the depth
+    even though lines grow with it.
+    """
+    yield f"{root.name}\n"
+    # [children, index of the next child to visit]
+    frames = [[root.children, 0]]
+    indent = ''
+    while frames:
+        frame = frames[-1]
+        children, i = frame
+        if i == len(children):
+            frames.pop()
+            indent = indent[:-len(SPACE)]
+            continue
+        frame[1] = i + 1
+        child = children[i]
+        last = i == len(children) - 1
+        yield f"{indent}{LAST_BRANCH if last else BRANCH}{child.name}\n"
+        if child.children:
+            indent += SPACE if last else VERTICAL
+            frames.append([child.children, 0])
+
+def write_tree(root, f, buffer_chars=1 << 20):
+    """
+    Write the rendered tree to f in blocks of about buffer_chars
+    characters. Lines grow with depth, so the block is bounded by size
+    rather than by line count.
+    """
+    buffer = []
+    size = 0
+    for line in iter_tree_lines(root):
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_chars:
+            f.write(''.join(buffer))
+            buffer.clear()
+            size = 0
+    f.write(''.join(buffer))
+
+# ==========================================
+#           BINARY PARSE TREE
+# ==========================================
+# parse_tree.bin: a header, then four little-endian uint32 arrays over the
+# nodes in preorder (label string index, child count, subtree size) and
+# the string table (offsets into a UTF-8 blob, plus the blob). Subtree
+# sizes let a reader jump from a child to its next sibling.
+TREE_MAGIC = b'CMPT'
+TREE_VERSION = 1
+TREE_HEADER = struct.Struct('<4sIII')
+UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+
+def write_tree_binary(root, f):
+    labels, child_counts = array(UINT32), array(UINT32)
+    strings = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        labels.append(strings.setdefault(node.name, len(strings)))
+        children = node.children
+        child_counts.append(len(children))
+        stack.extend(reversed(children))
+
+    # In reverse preorder each node's children are on top of the stack.
+    sizes = array(UINT32, bytes(4 * len(labels)))
+    pending = []
+    for i in range(len(labels) - 1, -1, -1):
+        size = 1
+        for _ in range(child_counts[i]):
+            size += pending.pop()
+        sizes[i] = size
+        pending.append(size)
+
+    blob = bytearray()
+    offsets = array(UINT32, [0])
+    for name in strings:
+        blob += name.encode('utf-8')
+        offsets.append(len(blob))
+
+    f.write(TREE_HEADER.pack(TREE_MAGIC, TREE_VERSION, len(labels), len(strings)))
+    for table in (labels, child_counts, sizes, offsets):
+        if sys.byteorder != 'little':
+            table.byteswap()
+        f.write(table.tobytes())
+    f.write(blob)
+
+class BinaryTree:
+    """
+    Memory-mapped parse_tree.bin. Nodes are read on demand through
+    TreeView, so walking part of a large tree touches only those pages
+    and never builds the whole tree in memory.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, string_count = TREE_HEADER.unpack_from(self.mmap)
+        if magic != TREE_MAGIC or version != TREE_VERSION:
+            self.mmap.close()
+            raise ValueError(f"{path} is not a version {TREE_VERSION} binary parse tree")
+        self.count = count
+        pos = TREE_HEADER.size
+        tables = []
+        for length in (count, count, count, string_count + 1):
+            tables.append(self.uint32_array(pos, length))
+            pos += 4 * length
+        self.labels, self.child_counts, self.sizes, self.offsets = tables
+        self.blob = pos
+        self.names = {}
+
+    def uint32_array(self, pos, length):
+        view = memoryview(self.mmap)[pos:pos + 4 * length]
+        if sys.byteorder == 'little':
+            return view.cast(UINT32)
+        table = array(UINT32, view)
+        table.byteswap()
+        return table
+
+    def name(self, index):
+        label = self.labels[index]
+        name = self.names.get(label)
+        if name is None:
+            start = self.blob + self.offsets[label]
+            end = self.blob + self.offsets[label + 1]
+            name = self.names[label] = self.mmap[start:end].decode('utf-8')
+        return name
+
+    @property
+    def root(self):
+        return TreeView(self, 0)
+
+    def close(self):
+        # Drop the exported memoryviews first, or mmap refuses to close
+        self.labels = self.child_counts = self.sizes = self.offsets = None
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TreeView:
+    """
+    One node of a BinaryTree, with the .name and .children of Node, so
+    iter_tree_lines() and other tree walkers accept it.
+    """
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def name(self):
+        return self.tree.name(self.index)
+
+    @property
+    def children(self):
+        tree = self.tree
+        children = []
+        child = self.index + 1
+        for _ in range(tree.child_counts[self.index]):
+            children.append(TreeView(tree, child))
+            child += tree.sizes[child]
+        return children
+
+    def subtree_size(self):
+        return self.tree.sizes[self.index]
+
+    def to_node(self):
+        """
+        Materialize this subtree as Node objects.
+        """
+        tree = self.tree
+        root = Node(self.name)
+        stack = [(self.index, root)]
+        while stack:
+            index, node = stack.pop()
+            child = index + 1
+            for _ in range(tree.child_counts[index]):
+                stack.append((child, Node(tree.name(child), parent=node)))
+                child += tree.sizes[child]
+        return root
 
 # ==========================================
 #              PHASE 1: SCANNER
 # ==========================================
+
+# Token record produced by Scanner.tokens(); line and column are 1-based.
+# Being a tuple, token[0] and token[1] are the (type, value) pair that
+# get_next_token() returns.
+Token = namedtuple('Token', ['type', 'value', 'line', 'column'])
+
 class Scanner:
+    # Subclasses scanning bytes rather than str override these two
+    NEWLINE = '\n'
+    lexeme_width = staticmethod(len)
+    # Position of self.code[0] in the whole input
+    offset = 0
+
     def __init__(self, code):
         self.code = code
         self.pos = 0
         self.line_number = 1
         self.symbol_table = {}
         self.errors = []
+        # Set to a text file to have tokens() write the rows of tokens.txt
+        # to it as they are scanned
+        self.token_file = None
         
         self.keywords = [
             'break', 'else', 'if', 'for', 'int', 
@@ -37,6 +303,54 @@ class Scanner:
         for idx, keyword in enumerate(sorted(self.keywords), start=1):
             self.symbol_table[keyword] = idx
     
+    def __iter__(self):
+        return self.tokens()
+
+    def tokens(self):
+        """
+        Lazily yield Token records, ending with the ('SYMBOL', '$') token.
+        IDs enter the symbol table as they are scanned.
+        """
+        code = self.code
+        symbol_table = self.symbol_table
+        # One string object per distinct lexeme, however often it repeats
+        lexemes = {}
+        token_file = self.token_file
+        row_line, row = None, []
+        newline_char, width = self.NEWLINE, self.lexeme_width
+        # Scanning may resume mid-file (see IncrementalCompiler)
+        line_start = code.rfind(newline_char, 0, self.pos) + 1
+        prev_end = self.pos
+        offset = self.offset
+        while True:
+            token_type, value = self.get_next_token()
+            if self.code is not code:
+                # A StreamScanner dropped consumed input from its window
+                shift = self.offset - offset
+                code, offset = self.code, self.offset
+                line_start -= shift
+                prev_end -= shift
+            end = self.pos
+            is_eof = token_type == 'SYMBOL' and value == '$'
+            start = end if is_eof else end - width(value)
+            newline = code.rfind(newline_char, prev_end, start)
+            if newline >= 0:
+                line_start = newline + 1
+            prev_end = end
+            value = lexemes.setdefault(value, value)
+            if token_type == 'ID' and value not in symbol_table:
+                symbol_table[value] = len(symbol_table) + 1
+            if token_file is not None:
+                if is_eof or self.line_number != row_line:
+                    if row:
+                        token_file.write(f"{row_line}.\t{' '.join(row)}\n")
+                    row_line, row = self.line_number, []
+                if not is_eof:
+                    row.append(f"({token_type}, {value})")
+            yield Token(token_type, value, self.line_number, start - line_start + 1)
+            if is_eof:
+                return
+
     def skip_whitespace(self):
         while self.pos < len(self.code) and self.code[self.pos] in ' \n\r\t\v\f':
             if self.code[self.pos] == '\n':
@@ -44,106 +358,445 @@ class Scanner:
             self.pos += 1
 
     def get_next_token(self):
-        self.skip_whitespace()
-        
-        if self.pos >= len(self.code):
-            return ('SYMBOL', '$')
-        
-        if self.pos < len(self.code) - 1 and self.code[self.pos:self.pos+2] == '*/':
+        # Comments and errors loop back here instead of recursing, so a
+        # long run of them cannot exhaust the stack
+        while True:
+            self.skip_whitespace()
+            
+            if self.pos >= len(self.code):
+                return ('SYMBOL', '$')
+            
+            if self.pos < len(self.code) - 1 and self.code[self.pos:self.pos+2] == '*/':
+                self.errors.append({
+                    'line': self.line_number, 'error_str': '*/', 'message': 'Stray closing comment'
+                })
+                self.pos += 2
+                continue
+            
+            if self.pos < len(self.code):
+                if self.pos < len(self.code) - 1:
+                    two_char = self.code[self.pos:self.pos+2]
+                    if two_char == '//':
+                        self.pos += 2
+                        while self.pos < len(self.code) and self.code[self.pos] != '\n':
+                            self.pos += 1
+                        continue
+                    elif two_char == '/*':
+                        start_line = self.line_number
+                        self.pos += 2
+                        closed = False
+                        while self.pos < len(self.code):
+                            if self.pos < len(self.code)-1 and self.code[self.pos:self.pos+2] == '*/':
+                                self.pos += 2
+                                closed = True
+                                break
+                            if self.code[self.pos] == '\n':
+                                self.line_number += 1
+                            self.pos += 1
+                        if not closed:
+                            self.errors.append({'line': start_line, 'error_str': '/*', 'message': 'Open comment at EOF'})
+                            return ('SYMBOL', '$')
+                        continue
+                    elif two_char == '==':
+                        self.pos += 2
+                        return ('SYMBOL', '==')
+                
+                ch = self.code[self.pos]
+                if ch in ';:,[](){}+-*/=<':
+                    self.pos += 1
+                    return ('SYMBOL', ch)
+            
+            if self.code[self.pos].isdigit():
+                num_str = ''
+                while self.pos < len(self.code) and self.code[self.pos].isdigit():
+                    num_str += self.code[self.pos]
+                    self.pos += 1
+                return ('NUM', num_str)
+
+            if self.code[self.pos].isalpha() or self.code[self.pos] == '_':
+                id_str = ''
+                while self.pos < len(self.code) and (self.code[self.pos].isalnum() or self.code[self.pos] == '_'):
+                    id_str += self.code[self.pos]
+                    self.pos += 1
+                if id_str in self.keywords:
+                    return ('KEYWORD', id_str)
+                return ('ID', id_str)
+
             self.errors.append({
-                'line': self.line_number, 'error_str': '*/', 'message': 'Stray closing comment'
+                'line': self.line_number, 'error_str': self.code[self.pos], 'message': 'Illegal character'
             })
-            self.pos += 2
-            return self.get_next_token()
-        
-        if self.pos < len(self.code):
-            if self.pos < len(self.code) - 1:
-                two_char = self.code[self.pos:self.pos+2]
-                if two_char == '//':
-                    self.pos += 2
-                    while self.pos < len(self.code) and self.code[self.pos] != '\n':
-                        self.pos += 1
-                    return self.get_next_token()
-                elif two_char == '/*':
-                    start_line = self.line_number
-                    self.pos += 2
-                    closed = False
-                    while self.pos < len(self.code):
-                        if self.pos < len(self.code)-1 and self.code[self.pos:self.pos+2] == '*/':
-                            self.pos += 2
-                            closed = True
-                            break
-                        if self.code[self.pos] == '\n':
-                            self.line_number += 1
-                        self.pos += 1
-                    if not closed:
-                        self.errors.append({'line': start_line, 'error_str': '/*', 'message': 'Open comment at EOF'})
-                        return ('SYMBOL', '$')
-                    return self.get_next_token()
-                elif two_char == '==':
-                    self.pos += 2
-                    return ('SYMBOL', '==')
-            
-            ch = self.code[self.pos]
-            if ch in ';:,[](){}+-*/=<':
-                self.pos += 1
-                return ('SYMBOL', ch)
-        
-        if self.code[self.pos].isdigit():
-            num_str = ''
-            while self.pos < len(self.code) and self.code[self.pos].isdigit():
-                num_str += self.code[self.pos]
-                self.pos += 1
-            return ('NUM', num_str)
-
-        if self.code[self.pos].isalpha() or self.code[self.pos] == '_':
-            id_str = ''
-            while self.pos < len(self.code) and (self.code[self.pos].isalnum() or self.code[self.pos] == '_'):
-                id_str += self.code[self.pos]
-                self.pos += 1
-            if id_str in self.keywords:
-                return ('KEYWORD', id_str)
-            return ('ID', id_str)
-
-        self.errors.append({
-            'line': self.line_number, 'error_str': self.code[self.pos], 'message': 'Illegal character'
-        })
-        self.pos += 1
-        return self.get_next_token()
+            self.pos += 1
+
+class RegexScanner(Scanner):
+    """
+    Scanner that matches whole lexemes with one compiled master regex and
+    loops over comments and errors instead of recursing. Produces the same
+    tokens, line numbers and errors as Scanner.
+    """
+    # Leading whitespace is folded into every match so each token costs a
+    # single regex step. Alternatives are ordered by frequency; '*' and '/'
+    # come after the comment forms. END matches trailing whitespace at EOF.
+    TOKEN_RE = re.compile(r'''
+        [ \n\r\t\v\f]*
+        (?:
+            (?P<ID>[A-Za-z_]\w*)
+          | (?P<SYMBOL>[;:,\[\](){}+\-<]|==?)
+          | (?P<NUM>[0-9]+)
+          | (?P<STRAY>\*/)
+          | (?P<LINE_COMMENT>//[^\n]*)
+          | (?P<COMMENT>/\*.*?\*/)
+          | (?P<OPEN_COMMENT>/\*)
+          | (?P<OP>[*/])
+          | (?P<END>\Z)
+          | (?P<OTHER>.)
+        )
+    ''', re.VERBOSE | re.DOTALL)
+    WORD_RE = re.compile(r'\w')
+    # What the loop below needs to know about the type of self.code (see
+    # MmapScanner): the conversion of an ASCII lexeme to str, and the
+    # smallest non-ASCII code unit.
+    DECODE = str
+    NON_ASCII = '\x80'
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.matches = None
+
+    def get_next_token(self):
+        code = self.code
+        if self.matches is None:
+            self.matches = self.TOKEN_RE.finditer(code, self.pos)
+        decode, non_ascii, newline = self.DECODE, self.NON_ASCII, self.NEWLINE
+        for m in self.matches:
+            kind = m.lastgroup
+            start = m.start(kind)
+            if start != self.pos:
+                self.line_number += code[self.pos:start].count(newline)
+            lexeme = m.group(kind)
+            self.pos = m.end()
+
+            if kind == 'SYMBOL' or kind == 'OP':
+                return ('SYMBOL', decode(lexeme))
+            if kind == 'ID':
+                lexeme = decode(lexeme)
+                if self.pos < len(code) and code[self.pos] >= non_ascii:
+                    self.matches = None
+                    lexeme += self.scan_while(self.is_word)
+                if lexeme in self.keywords:
+                    return ('KEYWORD', lexeme)
+                return ('ID', lexeme)
+            if kind == 'NUM':
+                lexeme = decode(lexeme)
+                # str.isdigit() also accepts non-ASCII digits
+                if self.pos < len(code) and code[self.pos] >= non_ascii:
+                    self.matches = None
+                    return ('NUM', lexeme + self.scan_while(str.isdigit))
+                return ('NUM', lexeme)
+            if kind == 'END':
+                break
+            if kind == 'COMMENT':
+                self.line_number += lexeme.count(newline)
+            elif kind == 'STRAY':
+                self.errors.append({
+                    'line': self.line_number, 'error_str': '*/', 'message': 'Stray closing comment'
+                })
+            elif kind == 'OPEN_COMMENT':
+                self.errors.append({'line': self.line_number, 'error_str': '/*', 'message': 'Open comment at EOF'})
+                self.line_number += self.count_newlines(self.pos, len(code))
+                self.pos = len(code)
+                break
+            elif kind == 'OTHER':
+                # Non-ASCII letters and digits still start IDs and NUMs
+                lexeme = self.decode_char(lexeme)
+                if lexeme.isdigit():
+                    self.matches = None
+                    return ('NUM', lexeme + self.scan_while(str.isdigit))
+                if lexeme.isalpha():
+                    self.matches = None
+                    return ('ID', lexeme + self.scan_while(self.is_word))
+                self.errors.append({
+                    'line': self.line_number, 'error_str': lexeme, 'message': 'Illegal character'
+                })
+        # Nothing follows: later calls rescan from the end and return '$'
+        # too, and a mapped buffer is no longer referenced
+        self.matches = None
+        return ('SYMBOL', '$')
+
+    @staticmethod
+    def decode_char(char):
+        return char
+
+    def count_newlines(self, start, end):
+        return self.code.count('\n', start, end)
+
+    def next_char(self):
+        """
+        Return the character at self.pos and its length in code units.
+        """
+        return self.code[self.pos], 1
+
+    def is_word(self, char):
+        return self.WORD_RE.match(char) is not None
+
+    def scan_while(self, predicate):
+        chars = []
+        while self.pos < len(self.code):
+            char, size = self.next_char()
+            if not predicate(char):
+                break
+            chars.append(char)
+            self.pos += size
+        return ''.join(chars)
+
+class StreamScanner(RegexScanner):
+    """
+    RegexScanner over a file-like object (text or binary, e.g. a pipe),
+    read chunk_size at a time so compiling can begin before the input is
+    complete. self.code is a window holding the input from the start of
+    the token being scanned; a token that runs into the end of the window,
+    where the next chunk could still extend it (an ID, '=' before '=',
+    '/' before '*', an unclosed comment), is scanned again once the next
+    chunk is in.
+    """
+    def __init__(self, stream, chunk_size=1 << 16):
+        super().__init__('')
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.eof = False
+
+    def fill(self, keep):
+        """
+        Drop the window before keep and append at least one chunk of input.
+        A window that keeps needing more (a long comment) doubles, so it is
+        rescanned only a logarithmic number of times.
+        """
+        size = max(self.chunk_size, len(self.code) - keep)
+        text = ''
+        while not text and not self.eof:
+            chunk = self.stream.read(size)
+            if isinstance(chunk, bytes):
+                text = self.decoder.decode(chunk, final=not chunk)
+            else:
+                text = chunk
+            self.eof = not chunk
+        self.code = self.code[keep:] + text
+        self.offset += keep
+        self.pos -= keep
+        self.matches = None
+
+    def get_next_token(self):
+        keep = self.pos
+        line_number, error_count = self.line_number, len(self.errors)
+        while True:
+            token = super().get_next_token()
+            if self.eof or (self.pos < len(self.code) and token != ('SYMBOL', '$')):
+                return token
+            # Undo the tentative scan and retry with more input
+            self.pos, self.line_number = keep, line_number
+            del self.errors[error_count:]
+            self.fill(keep)
+            keep = 0
+
+def utf8_width(text):
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+class MmapScanner(RegexScanner):
+    """
+    RegexScanner over UTF-8 bytes, typically a file mapped with map_file(),
+    so a large source is never decoded or copied as a whole: only lexemes
+    are decoded. Pages already scanned are handed back to the OS as the
+    scan advances. Produces the same tokens, line numbers and errors as
+    RegexScanner, except that columns count bytes rather than characters
+    on lines holding non-ASCII text.
+    """
+    NEWLINE = b'\n'
+    lexeme_width = staticmethod(utf8_width)
+
+    # RegexScanner.TOKEN_RE in bytes; OTHER takes one whole UTF-8 sequence
+    TOKEN_RE = re.compile(rb'''
+        [ \n\r\t\v\f]*
+        (?:
+            (?P<ID>[A-Za-z_][A-Za-z0-9_]*)
+          | (?P<SYMBOL>[;:,\[\](){}+\-<]|==?)
+          | (?P<NUM>[0-9]+)
+          | (?P<STRAY>\*/)
+          | (?P<LINE_COMMENT>//[^\n]*)
+          | (?P<COMMENT>/\*.*?\*/)
+          | (?P<OPEN_COMMENT>/\*)
+          | (?P<OP>[*/])
+          | (?P<END>\Z)
+          | (?P<OTHER>[\xc0-\xff][\x80-\xbf]*|.)
+        )
+    ''', re.VERBOSE | re.DOTALL)
+    # Scanned bytes are released in steps of this size
+    RELEASE_BYTES = 4 << 20
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.released = 0
+
+    def get_next_token(self):
+        token = super().get_next_token()
+        if self.pos - self.released >= self.RELEASE_BYTES:
+            self.release()
+        return token
+
+    DECODE = staticmethod(bytes.decode)
+    NON_ASCII = 0x80
+
+    @staticmethod
+    def decode_char(char):
+        return char.decode('utf-8', 'replace')
+
+    def count_newlines(self, start, end):
+        # An mmap has no count(); slice it a bounded piece at a time
+        count = 0
+        for offset in range(start, end, self.RELEASE_BYTES):
+            count += self.code[offset:min(end, offset + self.RELEASE_BYTES)].count(b'\n')
+        return count
+
+    def next_char(self):
+        lead = self.code[self.pos]
+        size = 1 if lead < 0xc0 else 2 if lead < 0xe0 else 3 if lead < 0xf0 else 4
+        return self.code[self.pos:self.pos + size].decode('utf-8', 'replace'), size
+
+    def release(self):
+        # Clean file-backed pages are simply reread if touched again
+        if isinstance(self.code, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+            end = (self.pos - 4096) // mmap.PAGESIZE * mmap.PAGESIZE
+            if end > 0:
+                self.code.madvise(mmap.MADV_DONTNEED, 0, end)
+        self.released = self.pos
+
+@contextlib.contextmanager
+def map_file(path):
+    """
+    Map the file at path read-only for MmapScanner. An empty file, which
+    cannot be mapped, yields b''.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+@contextlib.contextmanager
+def open_source(path, scanner_class=Scanner):
+    """
+    Give the source at path in the form scanner_class scans: mapped bytes
+    for an MmapScanner, decoded text otherwise.
+    """
+    if issubclass(scanner_class, MmapScanner):
+        with map_file(path) as code:
+            yield code
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            code = f.read()
+        yield code
+
+class TokenStream:
+    """
+    Iterator over a scanner's Token records with a bounded lookahead
+    buffer, so consumers can peek ahead or take tokens in batches without
+    holding more than `lookahead` tokens in memory.
+    """
+    def __init__(self, scanner, lookahead=8):
+        self.scanner = scanner
+        self.source = scanner.tokens()
+        self.lookahead = lookahead
+        self.buffer = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.buffer:
+            return self.buffer.popleft()
+        return next(self.source)
+
+    def peek(self, k=0):
+        """
+        Return the token k positions ahead without consuming it, or None
+        past the end of input.
+        """
+        if k >= self.lookahead:
+            raise ValueError(f"lookahead {k} exceeds buffer size {self.lookahead}")
+        while len(self.buffer) <= k:
+            token = next(self.source, None)
+            if token is None:
+                return None
+            self.buffer.append(token)
+        return self.buffer[k]
+
+    def batches(self, size):
+        batch = []
+        for token in self:
+            batch.append(token)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
 # ==========================================
 #              PHASE 2: PARSER
 # ==========================================
 
+def freeze_sets(table):
+    """
+    Turn a {nonterminal: [terminals]} table into frozensets, so membership
+    tests in the parser are hash lookups instead of list scans.
+    """
+    return {nt: frozenset(terminals) for nt, terminals in table.items()}
+
+LL1_TABLES = grammar.load_tables()
+
 class Parser:
     def __init__(self, scanner):
+        # scanner is a Scanner or a TokenStream; both iterate Token records
         self.scanner = scanner
+        self.tokens = iter(scanner)
         self.current_token = None   
         self.token_val = None       
         self.token_tuple = None     
+        self.line_number = 1
         self.syntax_errors = []
         self.root = None
         self.eof_reached = False
+        # One shared "(TYPE, lexeme)" string per distinct lexeme
+        self.labels = {}
         self.advance()
 
     def advance(self):
-        self.token_tuple = self.scanner.get_next_token()
-        token_type, token_value = self.token_tuple
+        token = next(self.tokens, None)
+        if token is None:
+            # Past the end of input the lookahead stays on '$'
+            return
+        self.token_tuple = token
+        self.line_number = token.line
+        token_type, token_value = token.type, token.value
         self.token_val = token_value
         
-        if token_type in ['KEYWORD', 'SYMBOL']:
+        if token_type in {'KEYWORD', 'SYMBOL'}:
             self.current_token = token_value
-        elif token_type in ['ID', 'NUM']:
+        elif token_type in {'ID', 'NUM'}:
             self.current_token = token_type
         elif token_value == '$':
             self.current_token = '$'
 
     def match(self, expected_token):
         if self.current_token == expected_token:
-            if self.token_tuple[1] == '$':
+            value = self.token_tuple[1]
+            if value == '$':
                 node = Node("$")
             else:
-                node = Node(f"({self.token_tuple[0]}, {self.token_tuple[1]})")
+                # A lexeme has a single token type, so it alone keys the label
+                label = self.labels.get(value)
+                if label is None:
+                    label = self.labels[value] = f"({self.token_tuple[0]}, {value})"
+                node = Node(label)
             self.advance()
             return node
         else:
@@ -151,111 +804,24 @@ class Parser:
                 self.report_error(f"missing {expected_token}")
             return None
 
+    # Reports past this many are dropped after one closing note, so a run
+    # of garbage cannot flood syntax_errors.txt; None reports them all.
+    MAX_SYNTAX_ERRORS = 1000
+
     def report_error(self, message):
-        self.syntax_errors.append(f"#{self.scanner.line_number} : syntax error, {message}")
+        errors = self.syntax_errors
+        limit = self.MAX_SYNTAX_ERRORS
+        if limit is not None and len(errors) >= limit:
+            if len(errors) == limit:
+                errors.append(f"#{self.line_number} : syntax error, too many errors, "
+                              f"further errors not reported")
+            return
+        errors.append(f"#{self.line_number} : syntax error, {message}")
 
     # --- FIRST & FOLLOW SETS ---
-    FIRST = {
-        'Program': ['int', 'void', 'EPSILON'],
-        'Declaration-list': ['int', 'void', 'EPSILON'],
-        'Declaration': ['int', 'void'],
-        'Declaration-initial': ['int', 'void'],
-        'Declaration-prime': ['(', '[', ';'],
-        'Var-declaration-prime': ['[', ';'],
-        'Fun-declaration-prime': ['('],
-        'Type-specifier': ['int', 'void'],
-        'Params': ['int', 'void'],
-        'Param-list': [',', 'EPSILON'],
-        'Param': ['int', 'void'],
-        'Param-prime': ['[', 'EPSILON'],
-        'Compound-stmt': ['{'],
-        'Statement-list': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', 'EPSILON'],
-        'Statement': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM'],
-        'Expression-stmt': ['break', ';', 'ID', '+', '-', '(', 'NUM'],
-        'Selection-stmt': ['if'],
-        'Else-stmt': ['else', 'EPSILON'],
-        'Iteration-stmt': ['for'],
-        'Return-stmt': ['return'],
-        'Return-stmt-prime': [';', 'ID', '+', '-', '(', 'NUM'],
-        'Expression': ['ID', '+', '-', '(', 'NUM'],
-        'B': ['=', '[', '(', '*', '/', '+', '-', '==', '<', 'EPSILON'],
-        'H': ['=', '*', '/', 'EPSILON', '+', '-', '==', '<'],
-        'Simple-expression-zegond': ['+', '-', '(', 'NUM'],
-        'Simple-expression-prime': ['(', '*', '/', '+', '-', '==', '<', 'EPSILON'],
-        'C': ['==', '<', 'EPSILON'],
-        'Relop': ['==', '<'],
-        'Additive-expression': ['+', '-', '(', 'ID', 'NUM'],
-        'Additive-expression-prime': ['(', '*', '/', '+', '-', 'EPSILON'],
-        'Additive-expression-zegond': ['+', '-', '(', 'NUM'],
-        'D': ['+', '-', 'EPSILON'],
-        'Addop': ['+', '-'],
-        'Term': ['+', '-', '(', 'ID', 'NUM'],
-        'Term-prime': ['(', '*', '/', 'EPSILON'],
-        'Term-zegond': ['+', '-', '(', 'NUM'],
-        'G': ['*', '/', 'EPSILON'],
-        'Signed-factor': ['+', '-', '(', 'ID', 'NUM'],
-        'Signed-factor-zegond': ['+', '-', '(', 'NUM'],
-        'Factor': ['(', 'ID', 'NUM'],
-        'Var-call-prime': ['(', '[', 'EPSILON'],
-        'Var-prime': ['[', 'EPSILON'],
-        'Factor-prime': ['(', 'EPSILON'],
-        'Factor-zegond': ['(', 'NUM'],
-        'Args': ['ID', '+', '-', '(', 'NUM', 'EPSILON'],
-        'Arg-list': ['ID', '+', '-', '(', 'NUM'],
-        'Arg-list-prime': [',', 'EPSILON']
-    }
-
-    # FIX: Added '}' to Expression-related FOLLOW sets to allow epsilon transitions
-    # when a semicolon is missing at the end of a block.
-    FOLLOW = {
-        'Program': ['$'],
-        'Declaration-list': ['$', '{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}'],
-        'Declaration': ['int', 'void', '$', '{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}'],
-        'Declaration-initial': ['(', '[', ';', ',', ')'],
-        'Declaration-prime': ['int', 'void', '$', '{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}'],
-        'Var-declaration-prime': ['int', 'void', '$', '{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}'],
-        'Fun-declaration-prime': ['int', 'void', '$', '{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}'],
-        'Type-specifier': ['ID'],
-        'Params': [')'],
-        'Param-list': [')'],
-        'Param': [',', ')'],
-        'Param-prime': [',', ')'],
-        'Compound-stmt': ['int', 'void', '$', '{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Statement-list': ['}'],
-        'Statement': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Expression-stmt': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Selection-stmt': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Else-stmt': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Iteration-stmt': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Return-stmt': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Return-stmt-prime': ['{', 'break', ';', 'if', 'for', 'return', 'ID', '+', '-', '(', 'NUM', '}', 'else'],
-        'Expression': [';', ')', ']', ',', '}'],
-        'B': [';', ')', ']', ',', '}'],
-        'H': [';', ')', ']', ',', '}'],
-        'Simple-expression-zegond': [';', ')', ']', ',', '}'],
-        'Simple-expression-prime': [';', ')', ']', ',', '}'],
-        'C': [';', ')', ']', ',', '}'],
-        'Relop': ['+', '-', '(', 'ID', 'NUM'],
-        'Additive-expression': [';', ')', ']', ',', '}'],
-        'Additive-expression-prime': ['==', '<', ';', ')', ']', ',', '}'],
-        'Additive-expression-zegond': ['==', '<', ';', ')', ']', ',', '}'],
-        'D': ['==', '<', ';', ')', ']', ',', '}'],
-        'Addop': ['+', '-', '(', 'ID', 'NUM'],
-        'Term': ['+', '-', ';', ')', ']', ',', '}'],
-        'Term-prime': ['+', '-', '==', '<', ';', ')', ']', ',', '}'],
-        'Term-zegond': ['+', '-', '==', '<', ';', ')', ']', ',', '}'],
-        'G': ['+', '-', '==', '<', ';', ')', ']', ',', '}'],
-        'Signed-factor': ['*', '/', '+', '-', ';', ')', '==', '<', ']', ',', '}'],
-        'Signed-factor-zegond': ['*', '/', '+', '-', '==', '<', ';', ')', ']', ',', '}'],
-        'Factor': ['*', '/', '+', '-', ';', ')', ']', ',', '}'],
-        'Var-call-prime': ['*', '/', '+', '-', ';', ')', '==', '<', ']', ',', '}'],
-        'Var-prime': ['*', '/', '+', '-', ';', ')', '==', '<', ']', ',', '}'],
-        'Factor-prime': ['*', '/', '+', '-', '==', '<', ';', ')', ']', ',', '}'],
-        'Factor-zegond': ['*', '/', '+', '-', '==', '<', ';', ')', ']', ',', '}'],
-        'Args': [')'],
-        'Arg-list': [')'],
-        'Arg-list-prime': [')']
-    }
+    # Computed from grammar.GRAMMAR (see grammar.py) and cached on disk.
+    FIRST = freeze_sets(LL1_TABLES.first)
+    FOLLOW = freeze_sets(LL1_TABLES.follow)
 
     def check_error(self, non_terminal, follow_override=None):
         first_set = self.FIRST[non_terminal]
@@ -282,52 +848,58 @@ class Parser:
 
     # --- GRAMMAR FUNCTIONS ---
 
-    def parse_program(self):
+    def parse_program(self, out_dir='.', binary=False):
+        node = self.build_program()
+        write_outputs(node, self.syntax_errors, out_dir, binary)
+        return node
+
+    def build_program(self):
         node = Node("Program")
         child = self.parse_declaration_list(top_level=True)
-        if child: child.parent = node
-        
+        node.add_child(child)
+
         if self.current_token == '$':
              Node("$", parent=node)
-        
-        with open('parse_tree.txt', 'w', encoding='utf-8') as f:
-            for pre, fill, n in RenderTree(node):
-                f.write("%s%s\n" % (pre, n.name))
-            
-        with open('syntax_errors.txt', 'w', encoding='utf-8') as f:
-            if not self.syntax_errors:
-                f.write("No syntax errors found.\n")
-            else:
-                for err in self.syntax_errors:
-                    f.write(err + "\n")
         return node
 
+    def link_chain(self, chain):
+        """
+        Nest each node of a right-recursive list under the previous one.
+        """
+        for i in range(len(chain) - 1, 0, -1):
+            chain[i - 1].add_child(chain[i])
+        return chain[0]
+
     def parse_declaration_list(self, top_level=False):
-        node = Node("Declaration-list")
-        if self.current_token in self.FIRST['Declaration']: 
-            node.add_child(self.parse_declaration())
-            node.add_child(self.parse_declaration_list(top_level))
-        elif self.current_token in self.FOLLOW['Declaration-list']:
-            if top_level and self.current_token == '}':
-                self.report_error(f"illegal {self.current_token}")
-                self.advance()
-                if self.current_token in self.FIRST['Declaration']:
-                    node.add_child(self.parse_declaration())
-                    node.add_child(self.parse_declaration_list(top_level))
+        # Loops over the Declaration-list tail instead of recursing; a
+        # discarded node stands for the old "return self.parse_...()" retry.
+        chain = []
+        while True:
+            node = Node("Declaration-list")
+            if self.current_token in self.FIRST['Declaration']:
+                node.add_child(self.parse_declaration())
+                chain.append(node)
+            elif self.current_token in self.FOLLOW['Declaration-list']:
+                if top_level and self.current_token == '}':
+                    self.report_error(f"illegal {self.current_token}")
+                    self.advance()
+                    if self.current_token in self.FIRST['Declaration']:
+                        node.add_child(self.parse_declaration())
+                        chain.append(node)
                 else:
-                    return self.parse_declaration_list(top_level)
-            else:
-                node.add_child(Node("epsilon"))
-        else:
-            if not self.check_error('Declaration-list'):
-                 if self.current_token in self.FIRST['Declaration']:
-                     node.add_child(self.parse_declaration())
-                     node.add_child(self.parse_declaration_list(top_level))
-                 else:
-                     return self.parse_declaration_list(top_level)
+                    node.add_child(Node("epsilon"))
+                    chain.append(node)
+                    break
             else:
-                 node.add_child(Node("epsilon"))
-        return node
+                if not self.check_error('Declaration-list'):
+                    if self.current_token in self.FIRST['Declaration']:
+                        node.add_child(self.parse_declaration())
+                        chain.append(node)
+                else:
+                    node.add_child(Node("epsilon"))
+                    chain.append(node)
+                    break
+        return self.link_chain(chain)
 
     def parse_declaration(self):
         if self.check_error('Declaration'): return None
@@ -405,24 +977,28 @@ class Parser:
         return node
 
     def parse_param_list(self):
-        node = Node("Param-list")
-        if self.current_token == ',':
-            node.add_child(self.match(','))
-            node.add_child(self.parse_param())
-            node.add_child(self.parse_param_list())
-        elif self.current_token in self.FOLLOW['Param-list']:
-            node.add_child(Node("epsilon"))
-        else:
-            if not self.check_error('Param-list'):
-                if self.current_token == ',':
-                    node.add_child(self.match(','))
-                    node.add_child(self.parse_param())
-                    node.add_child(self.parse_param_list())
-                else:
-                    return self.parse_param_list()
-            else:
+        chain = []
+        while True:
+            node = Node("Param-list")
+            if self.current_token == ',':
+                node.add_child(self.match(','))
+                node.add_child(self.parse_param())
+                chain.append(node)
+            elif self.current_token in self.FOLLOW['Param-list']:
                 node.add_child(Node("epsilon"))
-        return node
+                chain.append(node)
+                break
+            else:
+                if not self.check_error('Param-list'):
+                    if self.current_token == ',':
+                        node.add_child(self.match(','))
+                        node.add_child(self.parse_param())
+                        chain.append(node)
+                else:
+                    node.add_child(Node("epsilon"))
+                    chain.append(node)
+                    break
+        return self.link_chain(chain)
 
     def parse_param(self):
         if self.check_error('Param'): return None
@@ -459,22 +1035,26 @@ class Parser:
         return node
 
     def parse_statement_list(self):
-        node = Node("Statement-list")
-        if self.current_token in self.FIRST['Statement']:
-            node.add_child(self.parse_statement())
-            node.add_child(self.parse_statement_list())
-        elif self.current_token in self.FOLLOW['Statement-list']:
-            node.add_child(Node("epsilon"))
-        else:
-            if not self.check_error('Statement-list'):
-                if self.current_token in self.FIRST['Statement']:
-                    node.add_child(self.parse_statement())
-                    node.add_child(self.parse_statement_list())
-                else:
-                    return self.parse_statement_list()
-            else:
+        chain = []
+        while True:
+            node = Node("Statement-list")
+            if self.current_token in self.FIRST['Statement']:
+                node.add_child(self.parse_statement())
+                chain.append(node)
+            elif self.current_token in self.FOLLOW['Statement-list']:
                 node.add_child(Node("epsilon"))
-        return node
+                chain.append(node)
+                break
+            else:
+                if not self.check_error('Statement-list'):
+                    if self.current_token in self.FIRST['Statement']:
+                        node.add_child(self.parse_statement())
+                        chain.append(node)
+                else:
+                    node.add_child(Node("epsilon"))
+                    chain.append(node)
+                    break
+        return self.link_chain(chain)
 
     def parse_statement(self):
         if self.check_error('Statement'): return None
@@ -682,24 +1262,24 @@ class Parser:
         return node
 
     def parse_d(self):
-        node = Node("D")
-        if self.current_token in self.FIRST['Addop']:
-            node.add_child(self.parse_addop())
-            node.add_child(self.parse_term())
-            node.add_child(self.parse_d())
-        elif self.current_token in self.FOLLOW['D']:
-            node.add_child(Node("epsilon"))
-        else:
-            if not self.check_error('D'):
-                if self.current_token in self.FIRST['Addop']:
+        chain = []
+        while True:
+            node = Node("D")
+            chain.append(node)
+            if self.current_token in self.FIRST['Addop']:
+                node.add_child(self.parse_addop())
+                node.add_child(self.parse_term())
+            elif self.current_token in self.FOLLOW['D']:
+                node.add_child(Node("epsilon"))
+                break
+            else:
+                if not self.check_error('D') and self.current_token in self.FIRST['Addop']:
                     node.add_child(self.parse_addop())
                     node.add_child(self.parse_term())
-                    node.add_child(self.parse_d())
                 else:
                     node.add_child(Node("epsilon"))
-            else:
-                node.add_child(Node("epsilon"))
-        return node
+                    break
+        return self.link_chain(chain)
 
     def parse_addop(self):
         if self.check_error('Addop'): return None
@@ -731,31 +1311,24 @@ class Parser:
         return node
 
     def parse_g(self):
-        node = Node("G")
-        if self.current_token == '*':
-            node.add_child(self.match('*'))
-            node.add_child(self.parse_signed_factor())
-            node.add_child(self.parse_g())
-        elif self.current_token == '/':
-            node.add_child(self.match('/'))
-            node.add_child(self.parse_signed_factor())
-            node.add_child(self.parse_g())
-        elif self.current_token in self.FOLLOW['G']:
-            node.add_child(Node("epsilon"))
-        else:
-             if not self.check_error('G'):
-                 if self.current_token in ['*', '/']:
-                     if self.current_token == '*':
-                         node.add_child(self.match('*'))
-                     else:
-                         node.add_child(self.match('/'))
-                     node.add_child(self.parse_signed_factor())
-                     node.add_child(self.parse_g())
-                 else:
-                     node.add_child(Node("epsilon"))
-             else:
-                 node.add_child(Node("epsilon"))
-        return node
+        chain = []
+        while True:
+            node = Node("G")
+            chain.append(node)
+            if self.current_token in {'*', '/'}:
+                node.add_child(self.match(self.current_token))
+                node.add_child(self.parse_signed_factor())
+            elif self.current_token in self.FOLLOW['G']:
+                node.add_child(Node("epsilon"))
+                break
+            else:
+                if not self.check_error('G') and self.current_token in {'*', '/'}:
+                    node.add_child(self.match(self.current_token))
+                    node.add_child(self.parse_signed_factor())
+                else:
+                    node.add_child(Node("epsilon"))
+                    break
+        return self.link_chain(chain)
 
     def parse_signed_factor(self):
         if self.check_error('Signed-factor'): return None
@@ -884,26 +1457,1666 @@ class Parser:
         return node
 
     def parse_arg_list_prime(self):
-        node = Node("Arg-list-prime")
-        if self.current_token == ',':
-            node.add_child(self.match(','))
-            node.add_child(self.parse_expression())
-            node.add_child(self.parse_arg_list_prime())
-        elif self.current_token in self.FOLLOW['Arg-list-prime']:
-            node.add_child(Node("epsilon"))
+        chain = []
+        while True:
+            node = Node("Arg-list-prime")
+            chain.append(node)
+            if self.current_token == ',':
+                node.add_child(self.match(','))
+                node.add_child(self.parse_expression())
+            elif self.current_token in self.FOLLOW['Arg-list-prime']:
+                node.add_child(Node("epsilon"))
+                break
+            else:
+                if not self.check_error('Arg-list-prime') and self.current_token == ',':
+                    node.add_child(self.match(','))
+                    node.add_child(self.parse_expression())
+                else:
+                    node.add_child(Node("epsilon"))
+                    break
+        return self.link_chain(chain)
+
+# ==========================================
+#       PHASE 2: TABLE-DRIVEN PARSER
+# ==========================================
+
+# Events are (kind, name, last) tuples in preorder; EXIT events have no
+# `last`. For the other kinds, `last` tells whether the production has
+# nothing after this symbol. A missing symbol can still turn an earlier
+# node into the last one.
+ENTER, TOKEN, EPSILON, EXIT = 'enter', 'token', 'epsilon', 'exit'
+
+# One (nonterminal, follow-override key) context of the parse table; see
+# TableDrivenParser.build_tables(). guard is the lookaheads check_error()
+# passes without a word, or None when the nonterminal is not guarded;
+# recovery is its RECOVERY (kind, arg).
+TableRow = namedtuple('TableRow', ['guard', 'predict', 'first', 'plans', 'follow', 'recovery'])
+
+class TableDrivenParser(Parser):
+    """
+    LL(1) parser driven by the predict table grammar.py computes (and
+    caches in LL1_TABLES), using an explicit stack instead of parse_*
+    recursion.
+    RECOVERY reproduces the error handling of the hand-written methods so
+    both engines produce identical trees and error lists.
+    """
+
+    GRAMMAR = grammar.GRAMMAR
+
+    # (guarded, kind, arg) per nonterminal, matching its parse_* method:
+    #   guarded  - check_error() runs before the node is created
+    #   default  - unpredicted lookahead uses production `arg`
+    #   empty    - unpredicted lookahead leaves the node empty (reports `arg`)
+    #   recover  - check_error(), then FIRST-predicted production or `arg`
+    #   retry    - check_error(), then decide again with the new lookahead
+    RECOVERY = {
+        'Program': (False, 'default', 0),
+        'Declaration-list': (False, 'retry', None),
+        'Declaration': (True, 'default', 0),
+        'Declaration-initial': (True, 'default', 0),
+        'Declaration-prime': (True, 'empty', "Invalid declaration prime"),
+        'Var-declaration-prime': (True, 'empty', None),
+        'Fun-declaration-prime': (True, 'default', 0),
+        'Type-specifier': (True, 'empty', None),
+        'Params': (True, 'empty', None),
+        'Param-list': (False, 'retry', None),
+        'Param': (True, 'default', 0),
+        'Param-prime': (False, 'recover', 1),
+        'Compound-stmt': (True, 'default', 0),
+        'Statement-list': (False, 'retry', None),
+        'Statement': (True, 'empty', "Invalid statement"),
+        'Expression-stmt': (True, 'default', 0),
+        'Selection-stmt': (True, 'default', 0),
+        'Else-stmt': (False, 'recover', 1),
+        'Iteration-stmt': (True, 'default', 0),
+        'Return-stmt': (True, 'default', 0),
+        'Return-stmt-prime': (False, 'recover', 1),
+        'Expression': (True, 'empty', "Invalid expression start"),
+        'B': (False, 'default', 2),
+        'H': (False, 'default', 1),
+        'Simple-expression-zegond': (True, 'default', 0),
+        'Simple-expression-prime': (False, 'recover', 0),
+        'C': (False, 'recover', 1),
+        'Relop': (True, 'empty', None),
+        'Additive-expression': (True, 'default', 0),
+        'Additive-expression-prime': (False, 'default', 0),
+        'Additive-expression-zegond': (True, 'default', 0),
+        'D': (False, 'recover', 1),
+        'Addop': (True, 'empty', None),
+        'Term': (True, 'default', 0),
+        'Term-prime': (False, 'default', 0),
+        'Term-zegond': (True, 'default', 0),
+        'G': (False, 'recover', 2),
+        'Signed-factor': (True, 'default', 2),
+        'Signed-factor-zegond': (True, 'default', 2),
+        'Factor': (True, 'empty', "Invalid factor"),
+        'Var-call-prime': (False, 'default', 1),
+        'Var-prime': (False, 'recover', 1),
+        'Factor-prime': (False, 'recover', 1),
+        'Factor-zegond': (True, 'empty', None),
+        'Args': (False, 'recover', 1),
+        'Arg-list': (True, 'default', 0),
+        'Arg-list-prime': (False, 'recover', 1),
+    }
+
+    # '}' is illegal at top level, so the outermost Declaration-list
+    # (and its right-recursive tail) does not treat it as FOLLOW.
+    FOLLOW_OVERRIDES = {
+        ('Program', 'Declaration-list'):
+            Parser.FOLLOW['Declaration-list'] - {'}'},
+    }
+
+    # Terminals that are matched only if present, without a "missing" error.
+    OPTIONAL = {('Program', '$')}
+
+    # When this terminal is missing, the rest of the production is still
+    # parsed but left out of the tree.
+    DETACH_ON_MISSING = {('Params', 'ID')}
+
+    _tables = None
+
+    @classmethod
+    def build_tables(cls):
+        """
+        Build {(nonterminal, follow_key): TableRow} from the predict table
+        in LL1_TABLES. A row's predict dict maps a lookahead terminal
+        straight to its plan: the stack entries of the production, ready
+        to push, with the entry that ends it at the bottom. Nonterminal
+        entries carry the row they expand with, so the driver never looks
+        rows up. first keeps only the entries predicted by FIRST; a
+        FOLLOW_OVERRIDES context swaps in its own FOLLOW entries.
+        """
+        if cls._tables is not None:
+            return cls._tables
+        for nt, t, kind, _ in LL1_TABLES.conflicts:
+            if kind != 'FIRST/FOLLOW':
+                raise ValueError(f"LL(1) conflict in {nt} on {t}")
+        contexts = [(nt, None) for nt in cls.GRAMMAR]
+        contexts += [(key[1], key) for key in cls.FOLLOW_OVERRIDES]
+        tables = {}
+        for nt, key in contexts:
+            first = cls.FIRST[nt]
+            guard = None
+            if cls.RECOVERY[nt][0]:
+                guard = first | cls.FOLLOW[nt] if grammar.EPSILON in first else first
+                guard = guard - {'$'}
+            tables[(nt, key)] = TableRow(guard, {}, {}, [],
+                                         cls.FOLLOW_OVERRIDES[key] if key else None,
+                                         cls.RECOVERY[nt][1:])
+        for (nt, key), table_row in tables.items():
+            for rhs in cls.GRAMMAR[nt]:
+                plan = [(None, nt)] if rhs else []
+                for child in reversed(rhs):
+                    if child not in cls.GRAMMAR:
+                        plan.append((child, nt))
+                    elif child == nt:
+                        plan.append((child, table_row))
+                    else:
+                        plan.append((child, tables[(child, (nt, child) if (nt, child)
+                                                    in cls.FOLLOW_OVERRIDES else None)]))
+                table_row.plans.append(tuple(plan))
+            row = LL1_TABLES.predict[nt]
+            table_row.first.update((t, table_row.plans[idx])
+                                   for t, idx in row.items() if t in cls.FIRST[nt])
+            if key is None:
+                table_row.predict.update((t, table_row.plans[idx]) for t, idx in row.items())
+                continue
+            table_row.predict.update(table_row.first)
+            nullable = next((plan for plan, rhs in zip(table_row.plans, cls.GRAMMAR[nt])
+                             if grammar.EPSILON in grammar.first_of_sequence(
+                                 rhs, LL1_TABLES.first, cls.GRAMMAR)), None)
+            if nullable is not None:
+                for t in table_row.follow:
+                    table_row.predict.setdefault(t, nullable)
+        cls._tables = tables
+        return tables
+
+    def choose_production(self, nt, row):
+        """
+        Pick the plan for a lookahead row.predict does not cover,
+        following RECOVERY. Returns None to leave the node empty.
+        """
+        predict, first, plans, follow = row.predict, row.first, row.plans, row.follow
+        kind, arg = row.recovery
+        while True:
+            plan = predict.get(self.current_token)
+            if plan is not None:
+                return plan
+            if kind == 'default':
+                return plans[arg]
+            if kind == 'empty':
+                if arg:
+                    self.report_error(arg)
+                return None
+            if self.check_error(nt, follow):
+                return next((plan for plan in plans if not plan), None)
+            if kind == 'recover':
+                return first.get(self.current_token, plans[arg])
+
+    # Recognizer turns this off to run the same parse without yielding
+    # events or building labels.
+    EVENTS = True
+    # Instrumentation.parser_class() sets this to a dict it counts the
+    # expansions of each nonterminal in.
+    EXPANSIONS = None
+
+    def events(self, build=False):
+        """
+        Run the parse as a generator of events. This is the one stack
+        machine, with its error recovery, behind every table-driven
+        engine: EventParser can write the events straight to a file, and
+        a Recognizer yields none. With build, it yields none either but
+        attaches each node as it goes, leaving the root in self.tree, which
+        is how build_program() avoids an event per node. The stack holds
+        owner names rather than nodes, so it is bounded by the nesting
+        depth of the input.
+        """
+        grammar = self.GRAMMAR
+        emit = self.EVENTS
+        # The node being filled in, and the ones above it
+        parent = self.tree = None
+        parents = []
+        expansions = self.EXPANSIONS
+        tokens = self.tokens
+        labels = self.labels
+        # Entries are (nonterminal, TableRow), (terminal, owner) or
+        # (None, owner), which ends the owner's production; (None, None)
+        # ends a tail cut off by DETACH_ON_MISSING, which is parsed while
+        # `hidden` but not shown.
+        stack = [('Program', self.build_tables()[('Program', None)])]
+        pop, push = stack.pop, stack.extend
+        hidden = 0
+        # The lookahead lives in locals; self.token_tuple, current_token
+        # and line_number are brought up to date before anything that
+        # reads or advances them.
+        token, current = self.token_tuple, self.current_token
+        while stack:
+            symbol, arg = pop()
+
+            if symbol is None:
+                if arg is None:
+                    hidden -= 1
+                elif emit and not hidden:
+                    if build:
+                        parent = parents.pop()
+                    else:
+                        yield (EXIT, arg, None)
+                continue
+
+            # No nonterminal is named like a lookahead, so this is a
+            # matching terminal.
+            if symbol == current:
+                if emit and not hidden:
+                    label = labels.get(token[1])
+                    if label is None:
+                        self.token_tuple = token
+                        label = self.token_label()
+                    if build:
+                        # Node(label, parent) inlined, as below: this
+                        # runs once per node
+                        node = Node(label)
+                        node.parent = parent
+                        if parent.children:
+                            parent.children.append(node)
+                        else:
+                            parent.children = [node]
+                    else:
+                        yield (TOKEN, label, stack[-1][0] is None)
+                following = next(tokens, None)
+                # Past the end of input the lookahead stays on '$'
+                if following is not None:
+                    token = following
+                    current = token[0] if token[0] in ('ID', 'NUM') else token[1]
+                continue
+
+            if symbol not in grammar:
+                self.token_tuple, self.current_token, self.line_number = token, current, token[2]
+                if (arg, symbol) in self.OPTIONAL:
+                    continue
+                if not self.eof_reached:
+                    self.report_error(f"missing {symbol}")
+                if (arg, symbol) in self.DETACH_ON_MISSING:
+                    tail = []
+                    while stack[-1][0] is not None:
+                        tail.append(pop())
+                    tail.append((None, None))
+                    tail.reverse()
+                    push(tail)
+                    hidden += 1
+                continue
+
+            if expansions is not None:
+                expansions[symbol] = expansions.get(symbol, 0) + 1
+            guard = arg.guard
+            if guard is not None and current not in guard:
+                self.token_tuple, self.current_token, self.line_number = token, current, token[2]
+                missing = self.check_error(symbol)
+                token, current = self.token_tuple, self.current_token
+                if missing:
+                    continue
+            if emit and not hidden:
+                if build:
+                    node = Node(symbol)
+                    if parent is not None:
+                        node.parent = parent
+                        if parent.children:
+                            parent.children.append(node)
+                        else:
+                            parent.children = [node]
+                    else:
+                        self.tree = node
+                    parents.append(parent)
+                    parent = node
+                else:
+                    yield (ENTER, symbol, not stack or stack[-1][0] is None)
+
+            plan = arg.predict.get(current)
+            if plan is None:
+                self.token_tuple, self.current_token, self.line_number = token, current, token[2]
+                plan = self.choose_production(symbol, arg)
+                token, current = self.token_tuple, self.current_token
+                if plan is None:
+                    if emit and not hidden:
+                        if build:
+                            parent = parents.pop()
+                        else:
+                            yield (EXIT, symbol, None)
+                    continue
+            if plan:
+                push(plan)
+            elif emit and not hidden:
+                if build:
+                    node = Node('epsilon')
+                    node.parent = parent
+                    if parent.children:
+                        parent.children.append(node)
+                    else:
+                        parent.children = [node]
+                    parent = parents.pop()
+                else:
+                    yield (EPSILON, 'epsilon', True)
+                    yield (EXIT, symbol, None)
+        self.token_tuple, self.current_token, self.line_number = token, current, token[2]
+
+    def token_label(self):
+        """
+        The "(TYPE, lexeme)" label of the current token, one string per
+        distinct lexeme.
+        """
+        value = self.token_tuple[1]
+        if value == '$':
+            return '$'
+        label = self.labels.get(value)
+        if label is None:
+            label = self.labels[value] = f"({self.token_tuple[0]}, {value})"
+        return label
+
+    def build_program(self):
+        for _ in self.events(build=True):
+            pass
+        return self.tree
+
+class Recognizer(TableDrivenParser):
+    """
+    TableDrivenParser that makes the same decisions and reports the same
+    syntax errors but builds no tree: build_program() returns None, and
+    memory is bounded by the nesting depth of the input rather than its
+    size.
+    """
+    EVENTS = False
+
+    def build_program(self):
+        for _ in self.events():
+            pass
+        return None
+
+# ==========================================
+#              PARSE EVENTS
+# ==========================================
+
+class EventParser(TableDrivenParser):
+    """
+    TableDrivenParser whose events compile_scanner() writes straight to
+    parse_tree.txt when it is given a tree_file, so the tree is never
+    built.
+    """
+
+def write_event_tree(events, f, buffer_bytes=1 << 20):
+    """
+    Write parse_tree.txt from an event stream to f, a binary file, keeping
+    one frame per open node instead of the tree. Each node is drawn as its
+    `last` hint predicts. A node hinted not last can still turn out last,
+    when the siblings after it are missing, so from such a node until its
+    next sibling or the end of its parent settles it, output is held back
+    (in a temporary file past buffer_bytes). Nodes found drawn wrongly are
+    corrected as the held output is copied to f, so every line is written
+    to f once.
+    """
+    # One frame per open node: its pending child, which is the latest
+    # child if that was hinted not last, as (offset of its line in the held
+    # output, column of its branch). indent is the indent of the children
+    # of the innermost open node.
+    stack = []
+    indent = ''
+    buffer = []
+    size = 0
+    # Unsettled pending children, the held output's length and spill file,
+    # and (start, end, column) of each node drawn as not last that was last
+    holds = 0
+    held = 0
+    spill = None
+    corrections = []
+
+    def flush():
+        nonlocal size, spill
+        if holds:
+            if spill is None:
+                spill = tempfile.TemporaryFile()
+            spill.write(b''.join(buffer))
         else:
-            if not self.check_error('Arg-list-prime'):
-                 if self.current_token == ',':
-                     node.add_child(self.match(','))
-                     node.add_child(self.parse_expression())
-                     node.add_child(self.parse_arg_list_prime())
-                 else:
-                     node.add_child(Node("epsilon"))
+            f.write(b''.join(buffer))
+        buffer.clear()
+        size = 0
+
+    def release():
+        nonlocal size
+        if spill is not None and spill.tell():
+            spill.write(b''.join(buffer))
+            spill.seek(0)
+            source = spill
+        else:
+            source = io.BytesIO(b''.join(buffer))
+        buffer.clear()
+        size = 0
+        copy_corrected(source, f, corrections)
+        corrections.clear()
+        if source is spill:
+            spill.seek(0)
+            spill.truncate()
+
+    def settle(frame, is_last):
+        nonlocal holds
+        pending = frame[0]
+        if pending is None:
+            return
+        frame[0] = None
+        if is_last:
+            corrections.append((pending[0], held, pending[1]))
+        holds -= 1
+        if not holds:
+            release()
+
+    try:
+        for kind, name, last in events:
+            if kind == EXIT:
+                settle(stack.pop(), True)
+                if stack:
+                    indent = indent[:-len(SPACE)]
+                continue
+            if stack:
+                frame = stack[-1]
+                settle(frame, False)
+                line = f"{indent}{LAST_BRANCH if last else BRANCH}{name}\n"
+                # A node hinted last is last: the entry after it ends its
+                # parent's production
+                if not last:
+                    if not holds:
+                        flush()
+                        held = 0
+                    holds += 1
+                    frame[0] = (held, len(indent))
+                if kind == ENTER:
+                    indent += SPACE if last else VERTICAL
             else:
-                 node.add_child(Node("epsilon"))
-        return node
+                line = f"{name}\n"
+            data = line.encode('utf-8')
+            buffer.append(data)
+            size += len(data)
+            held += len(data)
+            if size >= buffer_bytes:
+                flush()
+            if kind == ENTER:
+                stack.append([None])
+        if holds:
+            holds = 0
+            release()
+        flush()
+    finally:
+        if spill is not None:
+            spill.close()
+
+def copy_corrected(source, f, corrections, chunk_size=1 << 20):
+    """
+    Copy held tree output from source to f, redrawing as last each node a
+    (start, end, column) correction names: the branch of its line at
+    offset start and the column of each line of its subtree, up to end.
+    Lines outside every correction are copied as they are.
+    """
+    # Subtrees nest, so outer corrections sort first and end last
+    corrections = sorted(corrections, key=lambda c: (c[0], -c[1]))
+    pos = 0
+    i = 0
+    while i < len(corrections):
+        offset, end = corrections[i][:2]
+        copy_bytes(source, f, offset - pos, chunk_size)
+        active = []
+        lines = []
+        size = 0
+        # The corrected indent shared by the subtree of the innermost
+        # active correction, up to the end of its column
+        prefix = None
+        while offset < end:
+            line = source.readline()
+            while active and active[-1][1] <= offset:
+                active.pop()
+                prefix = None
+            while i < len(corrections) and corrections[i][0] == offset:
+                active.append(corrections[i])
+                prefix = None
+                i += 1
+            text = line.decode('utf-8')
+            cut = active[-1][2] + len(SPACE)
+            if prefix is not None:
+                text = prefix + text[cut:]
+            else:
+                parts = []
+                prev = 0
+                for start, _, column in active:
+                    parts.append(text[prev:column])
+                    parts.append(LAST_BRANCH if start == offset else SPACE)
+                    prev = column + len(SPACE)
+                parts.append(text[prev:])
+                text = ''.join(parts)
+                if active[-1][0] != offset:
+                    prefix = text[:cut]
+            data = text.encode('utf-8')
+            lines.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                f.write(b''.join(lines))
+                lines.clear()
+                size = 0
+            offset += len(line)
+        f.write(b''.join(lines))
+        pos = end
+    shutil.copyfileobj(source, f, chunk_size)
+
+def copy_bytes(source, f, count, chunk_size=1 << 20):
+    while count > 0:
+        data = source.read(min(count, chunk_size))
+        if not data:
+            break
+        f.write(data)
+        count -= len(data)
+
+# ==========================================
+#              COMPILER API
+# ==========================================
+
+def format_syntax_errors(syntax_errors):
+    if not syntax_errors:
+        return "No syntax errors found.\n"
+    return ''.join(err + "\n" for err in syntax_errors)
+
+def format_by_line(items):
+    """
+    Render (line, text) pairs as one "line.\ttext text" row per line.
+    """
+    rows = []
+    current = None
+    for line, text in items:
+        if line != current:
+            rows.append([f"{line}.\t{text}"])
+            current = line
+        else:
+            rows[-1].append(text)
+    return ''.join(' '.join(row) + "\n" for row in rows)
+
+def format_lexical_errors(errors):
+    if not errors:
+        return "There is no lexical error.\n"
+    return format_by_line((e['line'], f"({e['error_str']}, {e['message']})") for e in errors)
+
+def format_symbol_table(symbol_table):
+    return ''.join(f"{idx}.\t{name}\n" for name, idx in symbol_table.items())
+
+def write_outputs(tree, syntax_errors, out_dir='.', binary=False):
+    """
+    Write parse_tree.txt and syntax_errors.txt into out_dir, and
+    parse_tree.bin too if binary is set. Without a tree (see Recognizer)
+    only syntax_errors.txt is written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if tree is not None:
+        with open(os.path.join(out_dir, 'parse_tree.txt'), 'w', encoding='utf-8') as f:
+            write_tree(tree, f)
+    with open(os.path.join(out_dir, 'syntax_errors.txt'), 'w', encoding='utf-8') as f:
+        f.write(format_syntax_errors(syntax_errors))
+    if binary and tree is not None:
+        with open(os.path.join(out_dir, 'parse_tree.bin'), 'wb') as f:
+            write_tree_binary(tree, f)
+
+class CompileResult:
+    def __init__(self, tree, syntax_errors, lexical_errors, symbol_table=None, tokens_text=None):
+        self.tree = tree
+        self.syntax_errors = syntax_errors
+        self.lexical_errors = lexical_errors
+        self.symbol_table = symbol_table
+        self.tokens_text = tokens_text
+
+    def parse_tree_text(self):
+        return ''.join(iter_tree_lines(self.tree))
+
+    def syntax_errors_text(self):
+        return format_syntax_errors(self.syntax_errors)
+
+    def scanner_outputs(self):
+        return [
+            ('lexical_errors.txt', self.lexical_errors, format_lexical_errors),
+            ('symbol_table.txt', self.symbol_table, format_symbol_table),
+            ('tokens.txt', self.tokens_text, str),
+        ]
+
+    def write(self, out_dir='.', binary=False):
+        """
+        Write the parser outputs, plus lexical_errors.txt, symbol_table.txt
+        and tokens.txt for whichever scanner results this result holds.
+        """
+        write_outputs(self.tree, self.syntax_errors, out_dir, binary)
+        for name, value, render in self.scanner_outputs():
+            if value is not None:
+                with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+                    f.write(render(value))
+
+    def texts(self):
+        """
+        The text write() would put in each output file, by file name.
+        """
+        texts = {}
+        if self.tree is not None:
+            texts['parse_tree.txt'] = self.parse_tree_text()
+        texts['syntax_errors.txt'] = self.syntax_errors_text()
+        for name, value, render in self.scanner_outputs():
+            if value is not None:
+                texts[name] = render(value)
+        return texts
+
+def compile_source(code, engine=Parser, scanner_class=Scanner, record_tokens=False,
+                   instrument=None, tree_file=None, token_file=None):
+    """
+    Scan and parse C-minus source text without touching the filesystem.
+    Scanning continues past wherever the parser stops, in the same pass,
+    so lexical errors and the symbol table cover the whole text. The rows
+    of tokens.txt are written to token_file as they are scanned, or with
+    record_tokens kept as the result's tokens_text. An Instrumentation
+    given as instrument collects statistics on the run. With an
+    EventParser engine and a tree_file (see open_tree_output), the tree
+    is written there as it is parsed, and the result has none.
+    """
+    try:
+        if instrument is not None:
+            return compile_scanner(instrument.scanner_class(scanner_class)(code),
+                                   instrument.parser_class(engine), record_tokens, instrument,
+                                   tree_file, token_file)
+        return compile_scanner(scanner_class(code), engine, record_tokens, instrument, tree_file,
+                               token_file)
+    except RecursionError:
+        # The recursive parser spends several frames per nesting level;
+        # the table-driven one keeps an explicit stack and gives the same
+        # tree and errors.
+        if issubclass(engine, TableDrivenParser):
+            raise
+        if token_file is not None:
+            token_file.seek(0)
+            token_file.truncate()
+        return compile_source(code, TableDrivenParser, scanner_class, record_tokens, instrument,
+                              tree_file, token_file)
+
+def compile_stream(stream, engine=Parser, chunk_size=1 << 16, record_tokens=False,
+                   instrument=None, tree_file=None, token_file=None):
+    """
+    Like compile_source, but scanning a file-like object chunk by chunk
+    with StreamScanner, so the parser runs while input is still arriving.
+    A stream cannot be replayed after a RecursionError, so the recursive
+    Parser is replaced by TableDrivenParser, which gives the same output.
+    """
+    if not issubclass(engine, TableDrivenParser):
+        engine = TableDrivenParser
+    scanner_class = StreamScanner
+    if instrument is not None:
+        scanner_class, engine = instrument.scanner_class(scanner_class), instrument.parser_class(engine)
+    return compile_scanner(scanner_class(stream, chunk_size), engine, record_tokens, instrument,
+                           tree_file, token_file)
+
+# Compiles running at once in this process (the compile server's
+# threads): the collector stays off until the last of them finishes.
+_gc_pauses = 0
+_gc_was_enabled = False
+_gc_lock = threading.Lock()
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Turn the cyclic collector off while a tree is built. Every full pass
+    walks all the nodes built so far, which makes a large compile
+    superlinear, and parsing leaves no garbage cycles for it to find.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+def compile_scanner(scanner, engine=Parser, record_tokens=False, instrument=None, tree_file=None,
+                    token_file=None):
+    if instrument is not None:
+        with instrument.phase('compile'):
+            result = compile_scanner(scanner, engine, record_tokens, tree_file=tree_file,
+                                     token_file=token_file)
+        instrument.record(result)
+        return result
+    rows = io.StringIO() if record_tokens and token_file is None else None
+    scanner.token_file = token_file or rows
+    parser = engine(scanner)
+    with gc_paused():
+        if tree_file is not None:
+            write_event_tree(parser.events(), tree_file)
+            tree = None
+        else:
+            tree = parser.build_program()
+        for _ in parser.tokens:
+            pass
+    return CompileResult(tree, parser.syntax_errors, scanner.errors, scanner.symbol_table,
+                         rows.getvalue() if rows is not None else None)
+
+@contextlib.contextmanager
+def open_tree_output(out_dir, engine):
+    """
+    Open parse_tree.txt in out_dir for an EventParser engine, which writes
+    it while parsing. Other engines get None.
+    """
+    if not issubclass(engine, EventParser):
+        yield None
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'parse_tree.txt'), 'w+b') as f:
+        yield f
+
+def open_token_output(out_dir):
+    """
+    Open tokens.txt in out_dir for the scanner to write its rows to.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    return open(os.path.join(out_dir, 'tokens.txt'), 'w', encoding='utf-8')
+
+def compile_file(path, out_dir=None, cache=None, binary=False, instrument=None, **options):
+    """
+    Compile the file at path and write its outputs into out_dir
+    (default: the directory containing path). With a CompileCache, a
+    cached compilation of the same text is copied instead, and the
+    returned result has no tree or lexical errors. A path of '-' streams
+    standard input, which is never cached.
+    """
+    if out_dir is None:
+        out_dir = os.path.dirname(os.path.abspath(path))
+    engine = options.get('engine', Parser)
+    if path == '-':
+        with open_tree_output(out_dir, engine) as tree_file, open_token_output(out_dir) as token_file:
+            result = compile_stream(sys.stdin.buffer, engine, instrument=instrument,
+                                    tree_file=tree_file, token_file=token_file)
+        with timed_phase(instrument, 'write'):
+            result.write(out_dir, binary)
+        return result
+    with open_source(path, options.get('scanner_class', Scanner)) as code:
+        if cache is not None:
+            key = cache.key(code, **options)
+            if cache.fetch(key, out_dir):
+                with open(os.path.join(out_dir, 'syntax_errors.txt'), encoding='utf-8') as f:
+                    text = f.read()
+                syntax_errors = [] if text == format_syntax_errors([]) else text.splitlines()
+                return CompileResult(None, syntax_errors, None)
+        with open_tree_output(out_dir, engine) as tree_file, open_token_output(out_dir) as token_file:
+            result = compile_source(code, instrument=instrument, tree_file=tree_file,
+                                    token_file=token_file, **options)
+    with timed_phase(instrument, 'write'):
+        result.write(out_dir, binary)
+    if cache is not None:
+        cache.store(key, out_dir)
+    return result
+
+# ==========================================
+#              INSTRUMENTATION
+# ==========================================
+
+def nonterminal_methods(cls):
+    """
+    Map the parse_* methods of a Parser class to their nonterminals.
+    Program is left out: parse_program also writes the outputs.
+    """
+    methods = {}
+    for nt in grammar.GRAMMAR:
+        name = 'parse_' + nt.lower().replace('-', '_')
+        if nt != grammar.START and hasattr(cls, name):
+            methods[name] = nt
+    return methods
+
+class Instrumentation:
+    """
+    Opt-in statistics over one or more compiles: time per phase, tokens
+    by type, calls and time per nonterminal and parser helper (for
+    table-driven engines, untimed expansions per nonterminal), syntax
+    errors by recovery kind and parse tree nodes, optionally with a
+    cProfile run. Only the subclasses made by scanner_class() and
+    parser_class() are timed, so compiles without an Instrumentation run
+    the code they always did. Under cProfile, which times every function
+    itself, parser methods are left unwrapped.
+    """
+    HELPERS = ('advance', 'match', 'check_error')
+
+    def __init__(self, profile=False):
+        self.phases = {}
+        self.token_types = {}
+        # label -> [calls, self seconds, total seconds]
+        self.calls = {}
+        # nonterminal -> expansions by table-driven engines
+        self.expansions = {}
+        self.tree_nodes = {}
+        self.recovery = {}
+        self.compiles = 0
+        self.profiler = cProfile.Profile() if profile else None
+        # Time spent in timed callees of each active timed call
+        self.child_time = [0.0]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def scanner_class(self, cls):
+        stats = self
+
+        class InstrumentedScanner(cls):
+            def tokens(self):
+                clock, counts = time.perf_counter, stats.token_types
+                scanned = 0.0
+                try:
+                    start = clock()
+                    for token in super().tokens():
+                        scanned += clock() - start
+                        counts[token.type] = counts.get(token.type, 0) + 1
+                        yield token
+                        start = clock()
+                finally:
+                    stats.add_time('scan', scanned)
+
+        InstrumentedScanner.__name__ = f"Instrumented{cls.__name__}"
+        return InstrumentedScanner
+
+    def parser_class(self, cls):
+        if self.profiler:
+            return cls
+        methods = {name: self.timed(nt, getattr(cls, name))
+                   for name, nt in nonterminal_methods(cls).items()}
+        for name in self.HELPERS:
+            methods[name] = self.timed(name, getattr(cls, name))
+        if issubclass(cls, TableDrivenParser):
+            # One loop expands every nonterminal, so they are counted
+            # there rather than timed
+            methods['EXPANSIONS'] = self.expansions
+        return type(f"Instrumented{cls.__name__}", (cls,), methods)
+
+    def timed(self, label, method):
+        record = self.calls.setdefault(label, [0, 0.0, 0.0])
+        child_time, clock = self.child_time, time.perf_counter
+        # Recursive calls add to the total only at the outermost level
+        depth = [0]
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            child_time.append(0.0)
+            depth[0] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                depth[0] -= 1
+                record[0] += 1
+                record[1] += elapsed - child_time.pop()
+                if not depth[0]:
+                    record[2] += elapsed
+                child_time[-1] += elapsed
+        return wrapper
+
+    def record(self, result):
+        self.compiles += 1
+        for error in result.syntax_errors:
+            message = error.split('syntax error, ', 1)[-1]
+            if message.startswith('illegal'):
+                kind = 'illegal'
+            elif message.startswith('missing'):
+                kind = 'missing'
+            elif message == 'Unexpected EOF':
+                kind = 'unexpected_eof'
+            else:
+                kind = 'other'
+            self.recovery[kind] = self.recovery.get(kind, 0) + 1
+        stack = [result.tree] if result.tree is not None else []
+        nodes = self.tree_nodes
+        while stack:
+            node = stack.pop()
+            nodes[node.name] = nodes.get(node.name, 0) + 1
+            stack.extend(node.children)
+
+    def report(self):
+        phases = dict(self.phases)
+        compiled = phases.pop('compile', 0.0)
+        scanned = phases.pop('scan', 0.0)
+        phases = {'scan': scanned, 'parse': compiled - scanned, **phases}
+        calls = {label: {'calls': n, 'self_s': own, 'total_s': total}
+                 for label, (n, own, total) in self.calls.items() if n}
+        for nt, n in self.expansions.items():
+            entry = calls.setdefault(nt, {'calls': 0, 'self_s': None, 'total_s': None})
+            entry['calls'] += n
+        report = {
+            'compiles': self.compiles,
+            'phases_s': phases,
+            'tokens': sum(self.token_types.values()),
+            'tokens_by_type': self.token_types,
+            'calls': dict(sorted(calls.items(), key=lambda item: -(item[1]['self_s'] or 0.0))),
+            'syntax_errors_by_recovery': self.recovery,
+            'nodes': sum(self.tree_nodes.values()),
+            'nonterminal_nodes': {nt: self.tree_nodes[nt] for nt in grammar.GRAMMAR
+                                  if nt in self.tree_nodes},
+        }
+        if self.expansions:
+            report['notes'] = [
+                "table-driven engines count nonterminal expansions without timing "
+                "them (self_s and total_s are null), and read tokens without "
+                "calling advance or match",
+            ]
+        return report
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+    def dump_profile(self, path):
+        """
+        Write the cProfile data in pstats format, which snakeviz, gprof2dot
+        and flameprof turn into call graphs and flame graphs.
+        """
+        self.profiler.dump_stats(path)
+
+def timed_phase(instrument, name):
+    return instrument.phase(name) if instrument is not None else contextlib.nullcontext()
+
+# ==========================================
+#           COMPILATION CACHE
+# ==========================================
+
+def compiler_version():
+    """
+    Hash of this file, grammar.py and the grammar, so cached outputs from
+    another revision of the compiler or of its table analysis are never
+    reused.
+    """
+    digest = hashlib.sha256()
+    for path in (__file__, grammar.__file__):
+        with open(os.path.abspath(path), 'rb') as f:
+            digest.update(f.read())
+    digest.update(grammar.grammar_hash().encode('ascii'))
+    return digest.hexdigest()
+
+class CompileCache:
+    """
+    Content-addressed on-disk store of output files, keyed by the source
+    text, compiler version, engine/scanner pair and set of files.
+    Each entry is a directory whose mtime is bumped on every hit; when the
+    total size passes max_bytes the least recently used entries are
+    deleted. hits, misses and evictions count this instance's activity.
+    """
+    FILES = ('parse_tree.txt', 'syntax_errors.txt', 'lexical_errors.txt',
+             'symbol_table.txt', 'tokens.txt')
+
+    def __init__(self, root, max_bytes=256 * 10**6, files=FILES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.files = tuple(files)
+        self.version = compiler_version()
+        self.hits = self.misses = self.evictions = 0
+        self.size = None
+
+    def key(self, code, engine=Parser, scanner_class=Scanner):
+        digest = hashlib.sha256(f"{self.version}:{engine.__name__}:{scanner_class.__name__}:"
+                                f"{','.join(self.files)}:".encode())
+        digest.update(code.encode('utf-8', 'surrogatepass') if isinstance(code, str) else code)
+        return digest.hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def fetch(self, key, out_dir):
+        """
+        Copy a cached entry into out_dir. Returns False on a miss.
+        """
+        entry = self.entry_dir(key)
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            for name in self.files:
+                shutil.copyfile(os.path.join(entry, name), os.path.join(out_dir, name))
+            os.utime(entry)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, out_dir):
+        """
+        Add the outputs just written to out_dir under key.
+        """
+        entry = self.entry_dir(key)
+        tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            size = 0
+            for name in self.files:
+                shutil.copyfile(os.path.join(out_dir, name), os.path.join(tmp, name))
+                size += os.path.getsize(os.path.join(tmp, name))
+            os.rename(tmp, entry)
+        except OSError:
+            # Another process or thread stored it first, or the cache is unwritable
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        if self.size is None:
+            self.size = sum(size for _, _, size in self.entries())
+        else:
+            self.size += size
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """
+        Yield (mtime, path, size) for every entry in the cache.
+        """
+        try:
+            buckets = list(os.scandir(self.root))
+        except OSError:
+            return
+        for bucket in buckets:
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    yield entry.stat().st_mtime, entry.path, size
+                except OSError:
+                    continue
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache is back under
+        90% of max_bytes, so a full cache does not evict on every store.
+        """
+        entries = sorted(self.entries())
+        self.size = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if self.size <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            self.size -= size
+            self.evictions += 1
+
+def format_cache_summary(cache, hits, misses):
+    entries = list(cache.entries())
+    size = sum(size for _, _, size in entries)
+    lookups = max(hits + misses, 1)
+    return (f"Cache: {hits} hits, {misses} misses ({100 * hits / lookups:.1f}% hit rate), "
+            f"{len(entries)} entries, {size / 1e6:.2f} of {cache.max_bytes / 1e6:.2f} MB")
+
+# ==========================================
+#          INCREMENTAL COMPILATION
+# ==========================================
+
+# A parsed Declaration or Compound-stmt that a later parse can splice in.
+# Tokens start..end-1 were consumed and token end was the lookahead when
+# it finished; errors holds (offset from start, message) pairs.
+Reusable = namedtuple('Reusable', ['start', 'end', 'node', 'errors', 'eof_reached'])
+
+class IncrementalParser(Parser):
+    """
+    Recursive-descent parser over a token list that reuses Declaration and
+    Compound-stmt subtrees from the previous parse when none of the tokens
+    they read, up to and including their final lookahead, changed. Those
+    methods depend on nothing but the tokens they read, so the tree and
+    errors are the same as a full parse.
+
+    window is (prefix, suffix, shift): tokens before `prefix` are the old
+    ones, and token i >= suffix is old token i - shift.
+    """
+    def __init__(self, tokens, memo=None, window=(0, 0, 0)):
+        self.token_list = tokens
+        self.index = -1
+        self.old_memo = memo or {}
+        self.old_keys = sorted(self.old_memo)
+        self.window = window
+        self.memo = {}
+        self.error_marks = []
+        super().__init__(tokens)
+
+    def advance(self):
+        if self.index + 1 < len(self.token_list):
+            self.index += 1
+            # Parser.advance takes its token from self.tokens
+            self.tokens = iter((self.token_list[self.index],))
+            super().advance()
+
+    def seek(self, index):
+        self.index = index - 1
+        self.advance()
+
+    def report_error(self, message):
+        super().report_error(message)
+        self.error_marks.append((self.index, message))
+
+    def old_entry(self, kind, start):
+        prefix, suffix, shift = self.window
+        if start < prefix:
+            entry = self.old_memo.get((start, kind))
+            if entry is not None and entry.end < prefix:
+                return entry
+        elif start >= suffix:
+            return self.old_memo.get((start - shift, kind))
+        return None
+
+    def reuse(self, kind, parse):
+        start = self.index
+        if self.eof_reached:
+            return parse()
+        entry = self.old_entry(kind, start)
+        if entry is None:
+            marks = len(self.error_marks)
+            node = parse()
+            errors = tuple((i - start, message) for i, message in self.error_marks[marks:])
+            self.memo[(start, kind)] = Reusable(start, self.index, node, errors, self.eof_reached)
+            return node
+
+        # Carry over this entry and the ones nested in it for the next edit
+        shift = start - entry.start
+        lo = bisect.bisect_left(self.old_keys, (entry.start, ''))
+        hi = bisect.bisect_left(self.old_keys, (entry.end, ''))
+        for key in self.old_keys[lo:hi]:
+            old = self.old_memo[key]
+            self.memo[(key[0] + shift, key[1])] = old._replace(start=old.start + shift, end=old.end + shift)
+        for offset, message in entry.errors:
+            self.seek(start + offset)
+            self.report_error(message)
+        self.seek(entry.end + shift)
+        self.eof_reached = entry.eof_reached
+        return entry.node
+
+    def parse_declaration(self):
+        return self.reuse('Declaration', super().parse_declaration)
+
+    def parse_compound_stmt(self):
+        return self.reuse('Compound-stmt', super().parse_compound_stmt)
+
+class IncrementalCompiler:
+    """
+    Compile one source text and keep its tokens and parse results, so that
+    edit() rescans only the text around a change and reparses only the
+    Declaration and Compound-stmt subtrees that read changed tokens. Each
+    result matches compile_source() on the edited text. Successive results
+    share subtrees, so only the latest tree should be used.
+    """
+    def __init__(self, code='', scanner_class=Scanner):
+        self.scanner_class = scanner_class
+        self.code = ''
+        self.tokens = [Token('SYMBOL', '$', 1, 1)]
+        self.starts = [0]
+        # error_counts[i]: lexical errors found up to and including token i
+        self.error_counts = [0]
+        self.lexical_errors = []
+        self.memo = {}
+        self.result = self.edit(0, 0, code)
+
+    def token_end(self, i):
+        token = self.tokens[i]
+        if token.type == 'SYMBOL' and token.value == '$':
+            return self.starts[i]
+        return self.starts[i] + len(token.value)
+
+    def edit(self, start, end, text):
+        """
+        Replace code[start:end] with text and return the new CompileResult.
+        """
+        old_code, tokens, starts, counts = self.code, self.tokens, self.starts, self.error_counts
+        code = old_code[:start] + text + old_code[end:]
+        delta = len(text) - (end - start)
+        line_delta = text.count('\n') - old_code.count('\n', start, end)
+
+        # Tokens before `first` end before the edit and cannot change;
+        # scanning resumes right after the last of them.
+        first = bisect.bisect_left(starts, start)
+        if first and self.token_end(first - 1) >= start:
+            first -= 1
+        scanner = self.scanner_class(code)
+        if first:
+            scanner.pos = self.token_end(first - 1)
+            scanner.line_number = tokens[first - 1].line
+        base = counts[first - 1] if first else 0
+
+        # Rescan until a token lines up with an old one past the end of the
+        # edited line; from there on the old tokens are still valid.
+        boundary = code.find('\n', start + len(text))
+        if boundary < 0:
+            boundary = len(code)
+        new_tokens, new_starts, new_counts = [], [], []
+        old = first
+        resync = None
+        for token in scanner.tokens():
+            if token.type == 'SYMBOL' and token.value == '$':
+                pos = scanner.pos
+            else:
+                pos = scanner.pos - len(token.value)
+            while old < len(tokens) and starts[old] + delta < pos:
+                old += 1
+            if (pos > boundary and old < len(tokens) and starts[old] + delta == pos
+                    and tokens[old][:2] == token[:2]):
+                resync = old
+                break
+            new_tokens.append(token)
+            new_starts.append(pos)
+            new_counts.append(base + len(scanner.errors))
+
+        lexical_errors = self.lexical_errors[:base] + scanner.errors
+        if resync is None:
+            suffix_tokens, suffix_starts, suffix_counts = [], [], []
+            window = (first, len(new_tokens) + first, 0)
+        else:
+            found = base + len(scanner.errors)
+            suffix_tokens = tokens[resync:]
+            suffix_errors = self.lexical_errors[counts[resync]:]
+            if line_delta:
+                suffix_tokens = [t._replace(line=t.line + line_delta) for t in suffix_tokens]
+                suffix_errors = [dict(e, line=e['line'] + line_delta) for e in suffix_errors]
+            lexical_errors += suffix_errors
+            suffix_starts = [s + delta for s in starts[resync:]]
+            suffix_counts = [c - counts[resync] + found for c in counts[resync:]]
+            suffix = first + len(new_tokens)
+            window = (first, suffix, suffix - resync)
+
+        self.code = code
+        self.tokens = tokens[:first] + new_tokens + suffix_tokens
+        self.starts = starts[:first] + new_starts + suffix_starts
+        self.error_counts = counts[:first] + new_counts + suffix_counts
+        self.lexical_errors = lexical_errors
+
+        try:
+            parser = IncrementalParser(self.tokens, self.memo, window)
+            tree = parser.build_program()
+            self.memo = parser.memo
+        except RecursionError:
+            # Too deep for recursive descent: parse the tokens with the
+            # table-driven engine, as compile_source does, and keep no
+            # subtrees for the next edit
+            parser = TableDrivenParser(self.tokens)
+            tree = parser.build_program()
+            self.memo = {}
+        self.result = CompileResult(tree, parser.syntax_errors, lexical_errors)
+        return self.result
+
+# ==========================================
+#            BATCH COMPILATION
+# ==========================================
+
+# cached is True on a cache hit, False on a miss and None without a cache.
+BatchResult = namedtuple('BatchResult', ['path', 'out_dir', 'size', 'syntax_errors', 'seconds', 'error', 'cached'])
+
+# Compiler options of a batch worker process, set once by init_worker.
+_worker_options = {}
+
+def init_worker(engine, scanner_class, cache=None, binary=False):
+    _worker_options['engine'] = engine
+    _worker_options['scanner_class'] = scanner_class
+    _worker_options['cache'] = cache
+    _worker_options['binary'] = binary
+    if hasattr(engine, 'build_tables'):
+        engine.build_tables()
+
+def compile_job(job):
+    path, out_dir = job
+    start = time.perf_counter()
+    cache = _worker_options.get('cache')
+    hits = cache.hits if cache else 0
+    try:
+        size = os.path.getsize(path)
+        result = compile_file(path, out_dir, **_worker_options)
+    except (OSError, UnicodeError) as e:
+        return BatchResult(path, out_dir, 0, 0, time.perf_counter() - start, str(e), None)
+    cached = cache.hits > hits if cache else None
+    return BatchResult(path, out_dir, size, len(result.syntax_errors),
+                       time.perf_counter() - start, None, cached)
+
+def compile_batch(inputs, out_dirs, workers=None, engine=Parser, scanner_class=Scanner,
+                  cache=None, binary=False):
+    """
+    Compile inputs[i] into out_dirs[i] across a pool of worker processes.
+    Results come back in input order, whatever order workers finish in.
+    """
+    jobs = list(zip(inputs, out_dirs))
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(engine, scanner_class, cache, binary)) as pool:
+        return list(pool.map(compile_job, jobs, chunksize=chunksize))
+
+def format_batch_summary(results, seconds):
+    seconds = max(seconds, 1e-9)
+    size = sum(r.size for r in results)
+    failed = sum(1 for r in results if r.error)
+    return (f"Compiled {len(results) - failed}/{len(results)} files "
+            f"({size / 1e6:.2f} MB) in {seconds:.2f}s: "
+            f"{len(results) / seconds:.1f} files/s, {size / 1e6 / seconds:.2f} MB/s")
+
+def output_dirs(inputs, out_dirs):
+    """
+    Pair each input with its output directory. A single out dir shared by
+    several inputs gets one subdirectory per input, named after the
+    input's path relative to the inputs' common directory. Raises
+    ValueError when two different inputs would share a directory, such as
+    x.txt and x.c.
+    """
+    if len(out_dirs) == len(inputs):
+        dirs = out_dirs
+    elif len(inputs) == 1:
+        return [out_dirs[0] if out_dirs else '.']
+    else:
+        root = out_dirs[0] if out_dirs else '.'
+        paths = [os.path.splitext(os.path.abspath(path))[0] for path in inputs]
+        common = os.path.commonpath([os.path.dirname(path) for path in paths])
+        dirs = [os.path.join(root, os.path.relpath(path, common)) for path in paths]
+    owners = {}
+    for path, out_dir in zip(inputs, dirs):
+        other = owners.setdefault(os.path.abspath(out_dir), path)
+        if os.path.abspath(other) != os.path.abspath(path):
+            raise ValueError(f"{other} and {path} would both write to {out_dir}")
+    return dirs
+
+# ==========================================
+#              COMPILE SERVER
+# ==========================================
+
+def serve_job(job):
+    """
+    Compile one input of a server request with the worker options (see
+    init_worker). job is (path, out_dir, source); source, when given, is
+    compiled in place of the file at path. With an out_dir the outputs are
+    written there as compile_file writes them; without one they come back
+    in the result's "files".
+    """
+    path, out_dir, source = job
+    options = dict(_worker_options)
+    cache, binary = options.pop('cache', None), options.pop('binary', False)
+    start = time.perf_counter()
+    response = {'path': path, 'error': None}
+    try:
+        if source is None and out_dir is not None:
+            result = compile_file(path, out_dir, cache, binary, **options)
+        else:
+            if source is None:
+                with open_source(path, options['scanner_class']) as code:
+                    result = compile_source(code, record_tokens=True, **options)
+                response['files'] = result.texts()
+            else:
+                if issubclass(options['scanner_class'], MmapScanner):
+                    source = source.encode('utf-8')
+                if out_dir is None:
+                    result = compile_source(source, record_tokens=True, **options)
+                    response['files'] = result.texts()
+                else:
+                    with open_token_output(out_dir) as token_file:
+                        result = compile_source(source, token_file=token_file, **options)
+                    result.write(out_dir, binary)
+    except (OSError, UnicodeError) as e:
+        response['error'] = str(e)
+        return response
+    response['syntax_errors'] = len(result.syntax_errors)
+    response['seconds'] = time.perf_counter() - start
+    return response
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+                response = self.server.respond(message)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                message, response = None, {'error': f"bad request: {e!r}"}
+            stopping = isinstance(message, dict) and message.get('command') == 'shutdown'
+            if stopping:
+                # Answer once the socket file is gone, so a new server can
+                # start as soon as the client sees the reply.
+                self.server.unlink_socket()
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            if stopping:
+                self.server.shutdown()
+                return
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Compile server on a Unix socket, so each compile costs only its scan
+    and parse: the compiler, its grammar tables and any cache stay loaded
+    between requests. Every connection gets a thread and sends requests as
+    JSON objects, one per line, each answered by one line:
+
+    {"inputs": [paths], "out_dirs": [dirs]} pairs inputs with output
+    directories as the command line does; "stdin" holds the text of a '-'
+    input. {"source": text} compiles text given inline, into "out_dir" if
+    given. Without output directories, each result carries the output
+    files as text in "files". {"command": "shutdown"} stops the server.
+
+    With workers, inputs are compiled across a pool of that many worker
+    processes (0: one per CPU), each set up once at startup; otherwise in
+    the connection's thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers=None, engine=Parser, scanner_class=Scanner,
+                 cache=None, binary=False):
+        init_worker(engine, scanner_class, cache, binary)
+        self.pool = None
+        if workers is not None:
+            self.pool = ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=init_worker,
+                                            initargs=(engine, scanner_class, cache, binary))
+        try:
+            super().__init__(socket_path, CompileRequestHandler)
+        except OSError:
+            if self.pool is not None:
+                self.pool.shutdown()
+            raise
+
+    def server_bind(self):
+        # Only this user may be able to put a socket at path, and the
+        # socket is made 0600 as it is bound rather than after.
+        import client
+        path = self.server_address
+        client.private_dir(os.path.dirname(os.path.abspath(path)), create=True)
+        # A socket file left behind by a server that did not shut down
+        # cleanly refuses connections; one that accepts them is in use.
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.unlink(path)
+            else:
+                raise OSError(errno.EADDRINUSE, "a compile server is already listening", path)
+            finally:
+                probe.close()
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        self.bound = True
+
+    def unlink_socket(self):
+        if getattr(self, 'bound', False):
+            self.bound = False
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+
+    def server_close(self):
+        super().server_close()
+        self.unlink_socket()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def respond(self, message):
+        if message.get('command') == 'shutdown':
+            return {}
+        if 'source' in message:
+            jobs = [(None, message.get('out_dir'), message['source'])]
+        else:
+            inputs = message['inputs']
+            out_dirs = message.get('out_dirs')
+            if out_dirs is None:
+                out_dirs = [None] * len(inputs)
+            elif len(out_dirs) not in (0, 1, len(inputs)):
+                return {'error': "give one out dir, or one per input"}
+            else:
+                try:
+                    out_dirs = output_dirs(inputs, out_dirs)
+                except ValueError as e:
+                    return {'error': str(e)}
+            if '-' in inputs and 'stdin' not in message:
+                return {'error': "input '-' needs the text of standard input in stdin"}
+            jobs = [(path, out_dir, message['stdin'] if path == '-' else None)
+                    for path, out_dir in zip(inputs, out_dirs)]
+        if self.pool is not None:
+            return {'results': list(self.pool.map(serve_job, jobs))}
+        return {'results': [serve_job(job) for job in jobs]}
+
+def serve(socket_path, workers=None, **options):
+    """
+    Run a CompileServer on socket_path until it is sent a shutdown
+    command, interrupted or terminated.
+    """
+    try:
+        server = CompileServer(socket_path, workers, **options)
+    except OSError as e:
+        print(f"Error: cannot serve on {socket_path}: {e.strerror or e}", file=sys.stderr)
+        return 1
+    with server:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Compile server listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(
+        description="C-minus scanner and parser. With no inputs, compiles "
+                    "input.txt next to this script into the current directory.")
+    arg_parser.add_argument('inputs', nargs='*', help="C-minus source files; - reads standard input")
+    arg_parser.add_argument('-o', '--out-dir', action='append', default=[],
+                            help="output directory; give once, or once per input")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None,
+                            help="compile inputs in N worker processes (0: one per CPU)")
+    arg_parser.add_argument('--table', action='store_true',
+                            help="use the table-driven LL(1) parser")
+    arg_parser.add_argument('--check', action='store_true',
+                            help="only check syntax: build and write no parse tree")
+    arg_parser.add_argument('--stream-tree', action='store_true',
+                            help="write parse_tree.txt while parsing instead of building the tree "
+                                 "(no parse_tree.bin)")
+    arg_parser.add_argument('--regex', action='store_true',
+                            help="use the regex-based scanner")
+    arg_parser.add_argument('--mmap', action='store_true',
+                            help="scan input files through mmap instead of reading them into memory")
+    arg_parser.add_argument('--binary', action='store_true',
+                            help="also write the tree as parse_tree.bin")
+    arg_parser.add_argument('--stats', metavar='FILE',
+                            help="write timings and counters of the compile to FILE as JSON")
+    arg_parser.add_argument('--profile', metavar='FILE',
+                            help="run the compile under cProfile and write pstats data to FILE")
+    arg_parser.add_argument('--cache', metavar='DIR',
+                            help="reuse outputs of unchanged inputs from this cache directory")
+    arg_parser.add_argument('--cache-size', type=float, default=256, metavar='MB',
+                            help="evict least recently used cache entries above this size")
+    arg_parser.add_argument('--serve', nargs='?', const='', metavar='SOCKET',
+                            help="run a compile server for client.py with the other options, "
+                                 "on this Unix socket (default: the one client.py uses)")
+    return arg_parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    options = {
+        'engine': (Recognizer if args.check else EventParser if args.stream_tree
+                   else TableDrivenParser if args.table else Parser),
+        'scanner_class': MmapScanner if args.mmap else RegexScanner if args.regex else Scanner,
+    }
+    if args.serve is not None:
+        if args.inputs or args.out_dir or args.stats or args.profile:
+            print("Error: --serve cannot be used with inputs, --out-dir, --stats or --profile",
+                  file=sys.stderr)
+            return 2
+        socket_path = args.serve
+        if not socket_path:
+            import client
+            socket_path = client.DEFAULT_SOCKET
+        return serve(socket_path, args.jobs, cache=open_cache(args), binary=args.binary, **options)
+    instrument = None
+    if args.stats or args.profile:
+        if args.jobs is not None:
+            print("Error: --stats and --profile cannot be used with --jobs", file=sys.stderr)
+            return 2
+        instrument = Instrumentation(profile=bool(args.profile))
+    status = compile_inputs(args, options, instrument)
+    if instrument is not None:
+        if args.stats:
+            instrument.write_json(args.stats)
+        if args.profile:
+            instrument.dump_profile(args.profile)
+    return status
+
+def open_cache(args):
+    if not args.cache:
+        return None
+    files = CompileCache.FILES
+    if args.check:
+        files = tuple(name for name in files if name != 'parse_tree.txt')
+    elif args.binary and not args.stream_tree:
+        files += ('parse_tree.bin',)
+    return CompileCache(args.cache, int(args.cache_size * 10**6), files)
+
+def compile_inputs(args, options, instrument=None):
+    if args.inputs:
+        if len(args.out_dir) not in (0, 1, len(args.inputs)):
+            print("Error: give one --out-dir, or one per input", file=sys.stderr)
+            return 2
+        if args.jobs is not None and '-' in args.inputs:
+            print("Error: standard input cannot be compiled with --jobs", file=sys.stderr)
+            return 2
+        try:
+            out_dirs = output_dirs(args.inputs, args.out_dir)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        cache = open_cache(args)
+        if args.jobs is not None:
+            start = time.perf_counter()
+            results = compile_batch(args.inputs, out_dirs, args.jobs, cache=cache,
+                                    binary=args.binary, **options)
+            for r in results:
+                if r.error:
+                    print(f"Error compiling {r.path}: {r.error}", file=sys.stderr)
+            print(format_batch_summary(results, time.perf_counter() - start))
+            if cache:
+                hits = sum(1 for r in results if r.cached)
+                misses = sum(1 for r in results if r.cached is False)
+                print(format_cache_summary(cache, hits, misses))
+            return 1 if any(r.error for r in results) else 0
+        failed = 0
+        for path, out_dir in zip(args.inputs, out_dirs):
+            try:
+                compile_file(path, out_dir, cache=cache, binary=args.binary,
+                             instrument=instrument, **options)
+            except (OSError, UnicodeError) as e:
+                print(f"Error compiling {path}: {e}", file=sys.stderr)
+                failed += 1
+        if cache:
+            print(format_cache_summary(cache, cache.hits, cache.misses))
+        return 1 if failed else 0
 
-def main():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     input_file = os.path.join(script_dir, 'input.txt')
     
@@ -912,16 +3125,18 @@ def main():
         return
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            code = f.read()
-    except Exception as e:
+        with open_source(input_file, options['scanner_class']) as code, \
+                open_tree_output('.', options['engine']) as tree_file, \
+                open_token_output('.') as token_file:
+            result = compile_source(code, instrument=instrument, tree_file=tree_file,
+                                    token_file=token_file, **options)
+    except (OSError, UnicodeError) as e:
         print(f"Error reading input.txt: {e}")
         return
     
-    scanner = Scanner(code)
-    parser = Parser(scanner)
-    parser.parse_program()
+    with timed_phase(instrument, 'write'):
+        result.write('.', args.binary)
     # print("Compilation completed.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
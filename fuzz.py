@@ -0,0 +1,366 @@
+import argparse
+import gc
+import hashlib
+import math
+import os
+import random
+import re
+import resource
+import signal
+import sys
+import time
+from collections import namedtuple
+
+import bench
+import compiler
+
+# ==========================================
+#              RUNNING ONE INPUT
+# ==========================================
+
+class TimeLimitExceeded(Exception):
+    pass
+
+class time_limit:
+    """
+    Raise TimeLimitExceeded in the main thread once `seconds` have passed.
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __enter__(self):
+        self.previous = signal.signal(signal.SIGALRM, self.expire)
+        signal.setitimer(signal.ITIMER_REAL, self.seconds)
+
+    def __exit__(self, *exc):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous)
+
+    def expire(self, signum, frame):
+        raise TimeLimitExceeded()
+
+def limit_memory(megabytes):
+    """
+    Cap this process's address space, so a runaway input raises
+    MemoryError instead of taking the machine down.
+    """
+    limit = int(megabytes * 2**20)
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+# kind is 'timeout', 'recursion', 'memory', 'crash' or 'mismatch'.
+Failure = namedtuple('Failure', ['kind', 'detail'])
+
+def tree_digest(root):
+    """
+    Hash of the parse_tree.txt text, without holding it all: a deeply
+    nested tree prints in space quadratic in its depth.
+    """
+    digest = hashlib.sha1()
+    for line in compiler.iter_tree_lines(root):
+        digest.update(line.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+def file_digest(f):
+    """
+    Hash of a parse_tree.txt an EventParser engine wrote to f, comparable
+    with tree_digest.
+    """
+    digest = hashlib.sha1()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def outputs(result, tree_file=None):
+    if tree_file is not None:
+        tree = file_digest(tree_file)
+    else:
+        tree = tree_digest(result.tree) if result.tree is not None else None
+    return tree, result.syntax_errors, result.lexical_errors, result.symbol_table
+
+def check(code, configs, timeout):
+    """
+    Compile code with every (engine, scanner) pair in configs and return
+    the first Failure, or None. Besides crashes, every pair must agree on
+    the outputs both produce.
+    """
+    reference = {}
+    for engine, scanner in configs:
+        try:
+            with time_limit(timeout), bench.tree_output(bench.ENGINES[engine]) as tree_file:
+                result = bench.compile_input(bench.scanner_input(scanner, code), engine, scanner,
+                                             tree_file)
+                tree, syntax_errors, lexical_errors, symbol_table = outputs(result, tree_file)
+        except TimeLimitExceeded:
+            return Failure('timeout', f"{engine}/{scanner} over {timeout}s")
+        except RecursionError:
+            return Failure('recursion', f"{engine}/{scanner}")
+        except MemoryError:
+            return Failure('memory', f"{engine}/{scanner}")
+        except Exception as e:
+            return Failure('crash', f"{engine}/{scanner}: {type(e).__name__}: {e}")
+        for name, value in (('parse tree', tree), ('syntax errors', syntax_errors),
+                            ('lexical errors', lexical_errors), ('symbol table', symbol_table)):
+            if value is None:
+                continue
+            if name not in reference:
+                reference[name] = (value, f"{engine}/{scanner}")
+            elif reference[name][0] != value:
+                return Failure('mismatch', f"{name} of {engine}/{scanner} and {reference[name][1]}")
+    return None
+
+# ==========================================
+#              GENERATING INPUTS
+# ==========================================
+
+POOL = ['int', 'void', 'if', 'else', 'for', 'break', 'return', 'x', 'arr', '0', '42',
+        ';', ',', '{', '}', '(', ')', '[', ']', '=', '==', '<', '+', '-', '*', '/',
+        '/*', '*/', '//', '\n'] + bench.ILLEGAL
+OPENERS = ['(', '{', '[', 'if (x)', 'x = (', '{ x = ', 'for (;;) {', '-']
+
+class Mutator:
+    """
+    Derive fuzz inputs from programs generated from the grammar, by
+    splicing, deleting, duplicating and nesting token runs and by
+    inserting stray tokens, characters and bytes.
+    """
+    def __init__(self, seed=0, max_size=2000):
+        self.random = random.Random(seed)
+        self.max_size = max_size
+
+    def program(self):
+        shape = self.random.choice(sorted(bench.SHAPES))
+        size = int(math.exp(self.random.uniform(math.log(5), math.log(self.max_size))))
+        generator = bench.ProgramGenerator(shape, size, self.random.randrange(2**32))
+        return generator.mutate(generator.tokens())
+
+    def span(self, tokens):
+        if not tokens:
+            return 0, 0
+        start = self.random.randrange(len(tokens))
+        return start, min(len(tokens), start + self.random.randint(1, 50))
+
+    def mutate(self, tokens):
+        rng = self.random
+        kind = rng.choice(['delete', 'duplicate', 'insert', 'nest', 'splice', 'bytes'])
+        at = rng.randint(0, len(tokens))
+        if kind == 'delete':
+            start, end = self.span(tokens)
+            return tokens[:start] + tokens[end:]
+        if kind == 'duplicate':
+            start, end = self.span(tokens)
+            return tokens[:at] + tokens[start:end] * rng.randint(1, 20) + tokens[at:]
+        if kind == 'insert':
+            return tokens[:at] + [rng.choice(POOL) for _ in range(rng.randint(1, 10))] + tokens[at:]
+        if kind == 'nest':
+            return tokens[:at] + [rng.choice(OPENERS)] * rng.randint(10, 400) + tokens[at:]
+        if kind == 'splice':
+            other = self.program()
+            start, end = self.span(other)
+            return tokens[:at] + other[start:end] + tokens[at:]
+        text = rng.randbytes(rng.randint(1, 20)).decode('utf-8', 'replace')
+        return tokens[:at] + [text] + tokens[at:]
+
+    def source(self):
+        tokens = self.program()
+        for _ in range(self.random.randint(0, 3)):
+            tokens = self.mutate(tokens)
+        return ' '.join(tokens)
+
+# ==========================================
+#              MINIMIZING
+# ==========================================
+
+PIECE_RE = re.compile(r'\s+|\w+|\S')
+
+def minimize(code, still_fails, max_tests=400):
+    """
+    Shrink code, split into lexeme-sized pieces, to a smaller input for
+    which still_fails(text) holds, by delta debugging (ddmin). Stops after
+    max_tests calls.
+    """
+    pieces = PIECE_RE.findall(code)
+    tests = 0
+    n = 2
+    while len(pieces) >= 2 and tests < max_tests:
+        chunk = math.ceil(len(pieces) / n)
+        reduced = False
+        for start in range(0, len(pieces), chunk):
+            complement = pieces[:start] + pieces[start + chunk:]
+            tests += 1
+            if still_fails(''.join(complement)):
+                pieces = complement
+                n = max(n - 1, 2)
+                reduced = True
+                break
+            if tests >= max_tests:
+                break
+        if not reduced:
+            if n >= len(pieces):
+                break
+            n = min(len(pieces), n * 2)
+    return ''.join(pieces)
+
+def save_reproducer(out_dir, failure, code):
+    os.makedirs(out_dir, exist_ok=True)
+    digest = hashlib.sha1(code.encode('utf-8', 'surrogatepass')).hexdigest()[:12]
+    path = os.path.join(out_dir, f"{failure.kind}-{digest}.txt")
+    with open(path, 'w', encoding='utf-8', errors='surrogatepass') as f:
+        f.write(code)
+    return path
+
+def fuzz(iterations, seed, configs, timeout, out_dir, max_size):
+    """
+    Check `iterations` generated inputs; minimize and save each failing
+    one. Returns the list of (Failure, reproducer path).
+    """
+    mutator = Mutator(seed, max_size)
+    found = []
+    for i in range(iterations):
+        code = mutator.source()
+        failure = check(code, configs, timeout)
+        if failure is None:
+            continue
+        print(f"[{i}] {failure.kind}: {failure.detail} ({len(code)} chars), minimizing")
+
+        def still_fails(text):
+            again = check(text, configs, timeout)
+            return again is not None and again.kind == failure.kind
+
+        small = minimize(code, still_fails)
+        path = save_reproducer(out_dir, failure, small)
+        print(f"    saved {len(small)} chars to {path}")
+        found.append((failure, path))
+    return found
+
+# ==========================================
+#              SCALING
+# ==========================================
+
+# Input families whose size can be dialed up; each takes (size, seed) and
+# returns source text of roughly size tokens.
+FAMILIES = {
+    **{f"program/{shape}": (lambda shape: lambda size, seed:
+                            bench.ProgramGenerator(shape, size, seed).source())(shape)
+       for shape in sorted(bench.SHAPES)},
+    **{f"garbage/{kind}": (lambda kind: lambda size, seed:
+                           bench.GARBAGE[kind](random.Random(seed), size * 4))(kind)
+       for kind in bench.GARBAGE},
+    # Blocks that are never closed: no statement list is known to end
+    # until EOF, which once made the streaming tree writer rewrite its
+    # output once per level. The tree text grows with the square of the
+    # depth, so this nests only size // 40 blocks deep.
+    'unclosed-blocks': lambda size, seed: 'void main(void) {' + '{ x = 1; y = 2; ' * (size // 40),
+}
+
+# Families nested as deep as they are long, whose tree text runs to
+# hundreds of megabytes at the smallest size: an engine that writes it is
+# scaled on 'unclosed-blocks' instead.
+DEEP_FAMILIES = {f"garbage/{kind}" for kind in bench.DEEP_GARBAGE}
+
+def fit_exponent(sizes, seconds):
+    """
+    Least-squares slope of log(seconds) against log(size): about 1 for
+    linear time, 2 for quadratic.
+    """
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return (sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+            / sum((x - mx) ** 2 for x in xs))
+
+def time_compile(code, engine, scanner, repeat=3):
+    """
+    Best of repeat compile times, with the cyclic collector on as it is
+    for users: its passes over a growing tree are part of the cost being
+    measured. The previous run's garbage is collected before each timed
+    run. Also returns the bytes of parse_tree.txt an EventParser engine
+    wrote, or None.
+    """
+    best = float('inf')
+    written = None
+    for _ in range(repeat):
+        with bench.tree_output(bench.ENGINES[engine]) as tree_file:
+            gc.collect()
+            start = time.perf_counter()
+            bench.compile_input(bench.scanner_input(scanner, code), engine, scanner, tree_file)
+            best = min(best, time.perf_counter() - start)
+            if tree_file is not None:
+                written = tree_file.tell()
+    return best, written
+
+def scaling(sizes, seed, configs, timeout, max_exponent):
+    """
+    Time every family at each size and flag the ones whose fitted
+    exponent exceeds max_exponent. Returns the flagged (family, config)
+    pairs. Engines that write parse_tree.txt skip DEEP_FAMILIES and are
+    fitted against the bytes written, which can grow with the square of
+    the input (a deep tree indents every line by its depth), rather than
+    against the input size, unless that output does not grow at all.
+    """
+    flagged = []
+    for family, make in FAMILIES.items():
+        for engine, scanner in configs:
+            if family in DEEP_FAMILIES and issubclass(bench.ENGINES[engine], compiler.EventParser):
+                continue
+            seconds, outputs = [], []
+            try:
+                for size in sizes:
+                    code = make(size, seed)
+                    with time_limit(timeout):
+                        best, written = time_compile(code, engine, scanner)
+                    seconds.append(best)
+                    outputs.append(written)
+            except (TimeLimitExceeded, MemoryError) as e:
+                print(f"{family + ' ' + engine + '/' + scanner:<44} {type(e).__name__} at size {size}")
+                flagged.append((family, (engine, scanner)))
+                continue
+            by_output = None not in outputs and len(set(outputs)) > 1
+            exponent = fit_exponent(outputs if by_output else sizes, seconds)
+            mark = '  NON-LINEAR' if exponent > max_exponent else ''
+            per = ' per output byte' if by_output else ''
+            print(f"{family + ' ' + engine + '/' + scanner:<44} exponent {exponent:5.2f}{per}, "
+                  f"{seconds[-1]:.3f}s at {sizes[-1]}{mark}")
+            if mark:
+                flagged.append((family, (engine, scanner)))
+    return flagged
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Fuzz the scanners and parsers with inputs derived from the grammar.")
+    arg_parser.add_argument('--mode', choices=['fuzz', 'scaling', 'all'], default='all')
+    arg_parser.add_argument('--iterations', type=int, default=200)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--engine', nargs='+', default=['recursive', 'table', 'check', 'event'],
+                            choices=sorted(bench.ENGINES))
+    arg_parser.add_argument('--scanner', nargs='+', default=['default', 'regex', 'mmap', 'stream'],
+                            choices=sorted(bench.SCANNERS))
+    arg_parser.add_argument('--timeout', type=float, default=10, help="seconds per compile")
+    arg_parser.add_argument('--memory', type=float, default=2048, metavar='MB',
+                            help="address space limit for this process")
+    arg_parser.add_argument('--max-size', type=int, default=2000,
+                            help="largest generated program, in tokens")
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 4000, 8000, 16000],
+                            help="input sizes, in tokens, for the scaling check")
+    arg_parser.add_argument('--max-exponent', type=float, default=1.25,
+                            help="flag families whose time grows faster than size**this")
+    arg_parser.add_argument('--out', default='fuzz-crashes', help="directory for reproducers")
+    args = arg_parser.parse_args(argv)
+
+    limit_memory(args.memory)
+    configs = [(engine, scanner) for engine in args.engine for scanner in args.scanner]
+    failed = False
+    if args.mode in ('fuzz', 'all'):
+        found = fuzz(args.iterations, args.seed, configs, args.timeout, args.out, args.max_size)
+        print(f"{args.iterations} inputs, {len(found)} failures")
+        failed = failed or bool(found)
+    if args.mode in ('scaling', 'all'):
+        flagged = scaling(args.sizes, args.seed, configs, args.timeout, args.max_exponent)
+        failed = failed or bool(flagged)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+# ==========================================
+#              C-MINUS GRAMMAR
+# ==========================================
+
+EPSILON = 'EPSILON'
+END = '$'
+START = 'Program'
+
+# Productions in the order the parse_* methods try them; [] is epsilon.
+GRAMMAR = {
+    'Program': [['Declaration-list', '$']],
+    'Declaration-list': [['Declaration', 'Declaration-list'], []],
+    'Declaration': [['Declaration-initial', 'Declaration-prime']],
+    'Declaration-initial': [['Type-specifier', 'ID']],
+    'Declaration-prime': [['Fun-declaration-prime'], ['Var-declaration-prime']],
+    'Var-declaration-prime': [['[', 'NUM', ']', ';'], [';']],
+    'Fun-declaration-prime': [['(', 'Params', ')', 'Compound-stmt']],
+    'Type-specifier': [['int'], ['void']],
+    'Params': [['int', 'ID', 'Param-prime', 'Param-list'], ['void']],
+    'Param-list': [[',', 'Param', 'Param-list'], []],
+    'Param': [['Declaration-initial', 'Param-prime']],
+    'Param-prime': [['[', ']'], []],
+    'Compound-stmt': [['{', 'Declaration-list', 'Statement-list', '}']],
+    'Statement-list': [['Statement', 'Statement-list'], []],
+    'Statement': [['Expression-stmt'], ['Compound-stmt'], ['Selection-stmt'],
+                  ['Iteration-stmt'], ['Return-stmt']],
+    'Expression-stmt': [['Expression', ';'], ['break', ';'], [';']],
+    'Selection-stmt': [['if', '(', 'Expression', ')', 'Statement', 'Else-stmt']],
+    'Else-stmt': [['else', 'Statement'], []],
+    'Iteration-stmt': [['for', '(', 'Expression', ';', 'Expression', ';',
+                        'Expression', ')', 'Compound-stmt']],
+    'Return-stmt': [['return', 'Return-stmt-prime']],
+    'Return-stmt-prime': [['Expression', ';'], [';']],
+    'Expression': [['Simple-expression-zegond'], ['ID', 'B']],
+    'B': [['=', 'Expression'], ['[', 'Expression', ']', 'H'], ['Simple-expression-prime']],
+    'H': [['=', 'Expression'], ['G', 'D', 'C']],
+    'Simple-expression-zegond': [['Additive-expression-zegond', 'C']],
+    'Simple-expression-prime': [['Additive-expression-prime', 'C']],
+    'C': [['Relop', 'Additive-expression'], []],
+    'Relop': [['=='], ['<']],
+    'Additive-expression': [['Term', 'D']],
+    'Additive-expression-prime': [['Term-prime', 'D']],
+    'Additive-expression-zegond': [['Term-zegond', 'D']],
+    'D': [['Addop', 'Term', 'D'], []],
+    'Addop': [['+'], ['-']],
+    'Term': [['Signed-factor', 'G']],
+    'Term-prime': [['Factor-prime', 'G']],
+    'Term-zegond': [['Signed-factor-zegond', 'G']],
+    'G': [['*', 'Signed-factor', 'G'], ['/', 'Signed-factor', 'G'], []],
+    'Signed-factor': [['+', 'Factor'], ['-', 'Factor'], ['Factor']],
+    'Signed-factor-zegond': [['+', 'Factor'], ['-', 'Factor'], ['Factor-zegond']],
+    'Factor': [['(', 'Expression', ')'], ['ID', 'Var-call-prime'], ['NUM']],
+    'Var-call-prime': [['(', 'Args', ')'], ['Var-prime']],
+    'Var-prime': [['[', 'Expression', ']'], []],
+    'Factor-prime': [['(', 'Args', ')'], []],
+    'Factor-zegond': [['(', 'Expression', ')'], ['NUM']],
+    'Args': [['Arg-list'], []],
+    'Arg-list': [['Expression', 'Arg-list-prime']],
+    'Arg-list-prime': [[',', 'Expression', 'Arg-list-prime'], []],
+}
+
+# Extra FOLLOW terminals seeded before the fixpoint and propagated like
+# any other. '}' after an expression lets a block end on a missing ';'.
+FOLLOW_PATCHES = {
+    'Expression': ['}'],
+}
+
+# ==========================================
+#              LL(1) ANALYSIS
+# ==========================================
+
+LL1Tables = namedtuple('LL1Tables', ['first', 'follow', 'predict', 'conflicts'])
+
+def first_of_sequence(symbols, first, grammar):
+    """
+    FIRST of a sentential form; contains EPSILON if every symbol is nullable.
+    """
+    result = set()
+    for symbol in symbols:
+        if symbol not in grammar:
+            result.add(symbol)
+            return result
+        result.update(first[symbol] - {EPSILON})
+        if EPSILON not in first[symbol]:
+            return result
+    result.add(EPSILON)
+    return result
+
+def compute_first(grammar):
+    first = {nt: set() for nt in grammar}
+    changed = True
+    while changed:
+        changed = False
+        for nt, productions in grammar.items():
+            for rhs in productions:
+                new = first_of_sequence(rhs, first, grammar) - first[nt]
+                if new:
+                    first[nt] |= new
+                    changed = True
+    return first
+
+def compute_follow(grammar, first, start=START, patches=None):
+    follow = {nt: set() for nt in grammar}
+    follow[start].add(END)
+    for nt, terminals in (patches or {}).items():
+        follow[nt].update(terminals)
+    changed = True
+    while changed:
+        changed = False
+        for nt, productions in grammar.items():
+            for rhs in productions:
+                for i, symbol in enumerate(rhs):
+                    if symbol not in grammar:
+                        continue
+                    rest = first_of_sequence(rhs[i + 1:], first, grammar)
+                    new = rest - {EPSILON}
+                    if EPSILON in rest:
+                        new |= follow[nt]
+                    new -= follow[symbol]
+                    if new:
+                        follow[symbol] |= new
+                        changed = True
+    return follow
+
+def compute_predict(grammar, first, follow):
+    """
+    Build {nonterminal: {terminal: production index}} and the list of
+    conflicts as (nonterminal, terminal, kind, indices). A FIRST entry
+    wins over a FOLLOW (epsilon) entry, which resolves the dangling else;
+    on a FIRST/FIRST conflict the earlier production is kept.
+    """
+    predict, conflicts = {}, []
+    for nt, productions in grammar.items():
+        row = {}
+        nullable = []
+        for idx, rhs in enumerate(productions):
+            rhs_first = first_of_sequence(rhs, first, grammar)
+            for t in sorted(rhs_first - {EPSILON}):
+                if t in row:
+                    conflicts.append((nt, t, 'FIRST/FIRST', [row[t], idx]))
+                else:
+                    row[t] = idx
+            if EPSILON in rhs_first:
+                nullable.append(idx)
+        for idx in nullable:
+            for t in sorted(follow[nt]):
+                if t in row:
+                    kind = 'FOLLOW/FOLLOW' if row[t] in nullable else 'FIRST/FOLLOW'
+                    conflicts.append((nt, t, kind, [row[t], idx]))
+                else:
+                    row[t] = idx
+        predict[nt] = row
+    return predict, conflicts
+
+def analyze(grammar=GRAMMAR, start=START, follow_patches=FOLLOW_PATCHES):
+    first = compute_first(grammar)
+    follow = compute_follow(grammar, first, start, follow_patches)
+    predict, conflicts = compute_predict(grammar, first, follow)
+    return LL1Tables(first, follow, predict, conflicts)
+
+# ==========================================
+#              TABLE CACHE
+# ==========================================
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.grammar_tables.json')
+
+def grammar_hash(grammar=GRAMMAR, start=START, follow_patches=FOLLOW_PATCHES):
+    """
+    Hash of the grammar and of this file, so a change to the analysis
+    code invalidates cached tables as a change to the grammar does.
+    """
+    with open(os.path.abspath(__file__), 'rb') as f:
+        digest = hashlib.sha256(f.read())
+    text = json.dumps([grammar, start, follow_patches], sort_keys=True)
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+def load_tables(grammar=GRAMMAR, start=START, follow_patches=FOLLOW_PATCHES, cache_path=CACHE_PATH):
+    """
+    Return the LL(1) tables for `grammar`, reading them from cache_path when
+    it was written for the same grammar hash and recomputing (and rewriting
+    the cache) otherwise. An unwritable cache location is not an error.
+    """
+    key = grammar_hash(grammar, start, follow_patches)
+    if cache_path:
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('hash') == key:
+                return LL1Tables(
+                    {nt: set(ts) for nt, ts in cached['first'].items()},
+                    {nt: set(ts) for nt, ts in cached['follow'].items()},
+                    cached['predict'],
+                    [tuple(c) for c in cached['conflicts']],
+                )
+        except (OSError, ValueError, KeyError):
+            pass
+
+    tables = analyze(grammar, start, follow_patches)
+    if cache_path:
+        data = {
+            'hash': key,
+            'first': {nt: sorted(ts) for nt, ts in tables.first.items()},
+            'follow': {nt: sorted(ts) for nt, ts in tables.follow.items()},
+            'predict': tables.predict,
+            'conflicts': tables.conflicts,
+        }
+        try:
+            tmp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return tables
+
+def main():
+    tables = analyze()
+    for nt in GRAMMAR:
+        print(f"{nt}")
+        print(f"    FIRST:  {' '.join(sorted(tables.first[nt]))}")
+        print(f"    FOLLOW: {' '.join(sorted(tables.follow[nt]))}")
+    for nt, t, kind, indices in tables.conflicts:
+        print(f"{kind} conflict in {nt} on {t}: productions {indices}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,24 +1,88 @@
+import argparse
+import importlib.util
 import os
 import subprocess
 import filecmp
 import shutil
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+# Compiler module loaded once per in-process worker (see _load_compiler).
+_compiler = None
+
+def _load_compiler(compiler_path):
+    global _compiler
+    spec = importlib.util.spec_from_file_location('compiler', os.path.abspath(compiler_path))
+    _compiler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(_compiler)
+
+def _read_stripped(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+def run_test_in_process(test_folder):
+    """
+    Compile test_folder/input.txt in this process and compare against the
+    expected files, without writing anything to disk.
+    Returns (test_folder, parse_tree_match, syntax_errors_match, seconds,
+    peak_bytes, error).
+    """
+    input_path = os.path.join(test_folder, 'input.txt')
+    if not os.path.exists(input_path):
+        return (test_folder, False, False, 0.0, 0, "input.txt missing")
+    with open(input_path, 'r', encoding='utf-8') as f:
+        code = f.read()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = _compiler.compile_source(code)
+        parse_tree = result.parse_tree_text()
+        syntax_errors = result.syntax_errors_text()
+        error = None
+    except Exception as e:
+        parse_tree = syntax_errors = None
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if error:
+        return (test_folder, False, False, seconds, peak, error)
+    expected_tree = _read_stripped(os.path.join(test_folder, 'parse_tree.txt'))
+    expected_errors = _read_stripped(os.path.join(test_folder, 'syntax_errors.txt'))
+    return (test_folder, parse_tree.strip() == expected_tree,
+            syntax_errors.strip() == expected_errors, seconds, peak, None)
 
 class CompilerTestRunner:
-    def __init__(self, compiler_path='compiler.py'):
+    def __init__(self, compiler_path='compiler.py', test_root='.', in_process=False, workers=1):
         self.compiler_path = compiler_path
+        self.test_root = test_root
+        self.in_process = in_process
+        self.workers = workers
         # Look for folders starting with 'T' (e.g., T01, T02...)
-        self.test_folders = sorted([f for f in os.listdir('.') if f.startswith('T') and os.path.isdir(f)])
+        self.test_folders = sorted([f for f in os.listdir(test_root)
+                                    if f.startswith('T') and os.path.isdir(os.path.join(test_root, f))])
         self.total_tests = len(self.test_folders)
         self.passed_tests = 0
+        self.timings = []
 
     def run_tests(self):
         print(f"🧪 Starting Compiler Test Suite")
         print(f"Total Test Folders: {self.total_tests}")
         print("-" * 40)
 
+        if self.in_process:
+            self._run_tests_in_process()
+            self._print_summary()
+            return
+
         for test_folder in self.test_folders:
             print(f"\n🔍 Running Test: {test_folder}")
-            result = self._run_single_test(test_folder)
+            result = self._run_single_test(os.path.join(self.test_root, test_folder))
             
             if result:
                 self.passed_tests += 1
@@ -28,6 +92,35 @@ class CompilerTestRunner:
 
         self._print_summary()
 
+    def _run_tests_in_process(self):
+        """
+        Run every test in a pool of worker processes that each load the
+        compiler once; tests share no files, so they can run concurrently.
+        """
+        folders = [os.path.join(self.test_root, f) for f in self.test_folders]
+        chunksize = max(1, len(folders) // (self.workers * 4))
+        start = time.perf_counter()
+        with ProcessPoolExecutor(self.workers, initializer=_load_compiler,
+                                 initargs=(self.compiler_path,)) as pool:
+            results = pool.map(run_test_in_process, folders, chunksize=chunksize)
+            for folder, tree_ok, errors_ok, seconds, peak, error in results:
+                name = os.path.basename(folder)
+                self.timings.append((seconds, peak, name))
+                stats = f"({seconds * 1000:.1f} ms, peak {peak / 1024:.0f} KiB)"
+                if tree_ok and errors_ok:
+                    self.passed_tests += 1
+                    print(f"✅ {name} PASSED {stats}")
+                    continue
+                print(f"❌ {name} FAILED {stats}")
+                if error:
+                    print(f"   -> {error}")
+                    continue
+                if not tree_ok:
+                    print("   -> Parse Tree Mismatch")
+                if not errors_ok:
+                    print("   -> Syntax Errors Mismatch")
+        self.wall_time = time.perf_counter() - start
+
     def _run_single_test(self, test_folder):
         # Paths for the expected files inside the test folder
         folder_input = os.path.join(test_folder, 'input.txt')
@@ -38,6 +131,8 @@ class CompilerTestRunner:
         root_input = 'input.txt'
         root_parse_tree = 'parse_tree.txt'
         root_syntax_errors = 'syntax_errors.txt'
+        # Written by the compiler but not compared here
+        root_scanner_outputs = ['lexical_errors.txt', 'symbol_table.txt', 'tokens.txt']
 
         # 1. SETUP: Copy the test input to the root as 'input.txt'
         if os.path.exists(folder_input):
@@ -53,7 +148,7 @@ class CompilerTestRunner:
                            capture_output=True, text=True, timeout=10)
         except subprocess.TimeoutExpired:
             print(f"❗ Timeout in {test_folder}")
-            self._cleanup_files([root_input, root_parse_tree, root_syntax_errors])
+            self._cleanup_files([root_input, root_parse_tree, root_syntax_errors] + root_scanner_outputs)
             return False
 
         # 3. VERIFY: Compare generated root files with expected folder files
@@ -66,7 +161,7 @@ class CompilerTestRunner:
             print(f"   -> Syntax Errors Mismatch")
 
         # 4. TEARDOWN: Clean up the files created in root
-        self._cleanup_files([root_input, root_parse_tree, root_syntax_errors])
+        self._cleanup_files([root_input, root_parse_tree, root_syntax_errors] + root_scanner_outputs)
 
         return parse_tree_match and syntax_errors_match
 
@@ -110,8 +205,28 @@ class CompilerTestRunner:
         if self.total_tests > 0:
             success_rate = (self.passed_tests / self.total_tests) * 100
             print(f"Success Rate: {success_rate:.2f}%")
+        if self.timings:
+            print(f"Wall Time: {self.wall_time:.2f}s with {self.workers} worker(s)")
+            print("Slowest Tests:")
+            for seconds, peak, name in sorted(self.timings, reverse=True)[:5]:
+                print(f"   {name}: {seconds * 1000:.1f} ms, peak {peak / 1024:.0f} KiB")
         print("=" * 40)
 
 if __name__ == '__main__':
-    test_runner = CompilerTestRunner()
+    arg_parser = argparse.ArgumentParser(description="Run the compiler against T* test folders.")
+    arg_parser.add_argument('--root', default='.', help="directory containing the test folders")
+    arg_parser.add_argument('--in-process', action='store_true',
+                            help="compile in worker processes instead of one subprocess per test")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                            help="worker processes for --in-process")
+    arg_parser.add_argument('--compiler', default=None,
+                            help="script run per test, e.g. client.py to use a compile server "
+                                 "(default: compiler.py)")
+    args = arg_parser.parse_args()
+    if args.in_process and args.compiler is not None:
+        # --in-process imports compiler.py itself; a script such as
+        # client.py has no compile_source to call.
+        arg_parser.error("--compiler cannot be used with --in-process")
+    test_runner = CompilerTestRunner(args.compiler or 'compiler.py', test_root=args.root, in_process=args.in_process,
+                                     workers=args.jobs)
     test_runner.run_tests()
\ No newline at end of file